@@ -1,25 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
 
 from app.core.auth import Authorization
+from app.core.config import settings, rate_limiter
 from app.db import schemas, models
-from app.db.database import get_db
-from app.utils import CRUD, agent
+from app.db.database import get_request_db, run_db, run_in_session
+from app.core.lazy import LazyModule
+from app.utils import CRUD, jobs
 
+from typing import List, Optional
+
+import asyncio
+import json
 import uuid
 
 router = APIRouter()
 
+# How often a stream follows a job that runs on another worker
+JOB_STATE_POLL_SECONDS = 2
+
+# The research graph and its LangChain integrations are imported on first use
+agent = LazyModule("app.utils.agent")
+
 @router.post("/initiate-research", status_code=status.HTTP_201_CREATED, tags=["AI"])
-def initiate_research(data: schemas.AnalystCreate, db = Depends(get_db), current_user = Depends(Authorization.get_current_user)):
+async def initiate_research(data: schemas.AnalystCreate, db = Depends(get_request_db), current_user = Depends(Authorization.get_current_user)):
 
     try:
+        if data.analyst_number > settings.max_analysts:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {settings.max_analysts} analysts are allowed."
+            )
+
         if data.session_id is not None:
             if not data.topic or not data.analyst_number:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Missing inputs."
                 )
-            res = agent.generate_analyst(data.analyst_number, data.topic, data.session_id)
+            await run_db(db, CRUD.ResearchSession.start, data.session_id, current_user.id, data.topic)
+            res = await agent.generate_analyst(data.analyst_number, data.topic, data.session_id, current_user.id)
 
             return res
         
@@ -30,7 +50,8 @@ def initiate_research(data: schemas.AnalystCreate, db = Depends(get_db), current
                     detail="Missing inputs."
                 )
             data.session_id = str(uuid.uuid4())
-            res = agent.generate_analyst(data.analyst_number, data.topic, data.session_id)
+            await run_db(db, CRUD.ResearchSession.start, data.session_id, current_user.id, data.topic)
+            res = await agent.generate_analyst(data.analyst_number, data.topic, data.session_id, current_user.id)
 
             return {"resault":res, "session_id": data.session_id}
 
@@ -43,20 +64,26 @@ def initiate_research(data: schemas.AnalystCreate, db = Depends(get_db), current
     #     )
     
 @router.post("/research-analyst-feedback", status_code=status.HTTP_200_OK, tags=["AI"])
-def analyst_feedback(data: schemas.AnalystFeedback, db = Depends(get_db), current_user = Depends(Authorization.get_current_user)):
+async def analyst_feedback(data: schemas.AnalystFeedback, response: Response, db = Depends(get_request_db), current_user = Depends(Authorization.get_current_user)):
 
     try:
-        res, topic, session_name, token_usage = agent.analyst_human_feedback(data.feedback, data.session_id)
+        await run_db(db, CRUD.ResearchSession.get_owned, data.session_id, current_user.id)
+
         if data.feedback == "approve":
-            chat_data = schemas.ChatHistoryCreate(
-                session_id=data.session_id,
-                session_name=session_name,
-                message=topic,
-                response=res
-            )
-            CRUD.ChatHistory.create(db, chat_data, current_user)
+            try:
+                job = await jobs.manager.submit(current_user.id, data.session_id)
+            except asyncio.QueueFull:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many reports are being generated. Please try again later."
+                )
+            response.status_code = status.HTTP_202_ACCEPTED
+
+            return {"job_id": job.job_id, "session_id": job.session_id, "status": job.status}
 
-        return res, token_usage
+        res = await agent.analyst_human_feedback(data.feedback, data.session_id, current_user.id)
+
+        return res
 
     except HTTPException as e:
         raise e
@@ -64,4 +91,106 @@ def analyst_feedback(data: schemas.AnalystFeedback, db = Depends(get_db), curren
     #     raise HTTPException(
     #         status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
     #         detail=f"detail: {e}"
-    #     )
\ No newline at end of file
+    #     )
+
+@router.get("/rate-limit", status_code=status.HTTP_200_OK, tags=["AI"])
+async def rate_limit_status(current_user = Depends(Authorization.get_current_user)):
+    """ Limiter of the worker that serves the request, its limits are this worker's share of the configured ones """
+
+    return {**rate_limiter.stats, "scope": "worker", "workers": settings.backend_workers}
+
+@router.get("/usage", response_model=List[schemas.UsageAggregate], tags=["AI"])
+async def get_usage(group_by: schemas.UsageGroupBy = schemas.UsageGroupBy.node, session_id: Optional[str] = None, db = Depends(get_request_db), current_user = Depends(Authorization.get_current_user)):
+
+    try:
+        return await run_db(db, CRUD.LLMUsage.aggregate, current_user.id, group_by, session_id)
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"detail: {e}"
+        )
+
+@router.get("/jobs/{job_id}", response_model=schemas.JobStatusResponse, tags=["AI"])
+async def get_job(job_id: str, db = Depends(get_request_db), current_user = Depends(Authorization.get_current_user)):
+
+    job = jobs.manager.get(job_id)
+    if job is not None and job.user_id == current_user.id:
+        return job
+
+    # The job may be running on another worker, its session row holds the last stored state
+    stored_job = await run_db(db, CRUD.ResearchSession.get_job, current_user.id, job_id)
+    if stored_job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found."
+        )
+    return stored_job
+
+@router.get("/sessions/{session_id}/job", response_model=schemas.JobStatusResponse, tags=["AI"])
+async def get_session_job(session_id: str, db = Depends(get_request_db), current_user = Depends(Authorization.get_current_user)):
+
+    stored_job = await run_db(db, CRUD.ResearchSession.get_job, current_user.id, None, session_id)
+    if stored_job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No report job found for this session."
+        )
+    return stored_job
+
+@router.get("/jobs/{job_id}/events", tags=["AI"])
+async def stream_job_events(job_id: str, current_user = Depends(Authorization.get_current_user)):
+
+    job = jobs.manager.get(job_id)
+    if job is None or job.user_id != current_user.id:
+        stored_job = await run_in_session(CRUD.ResearchSession.get_job, current_user.id, job_id)
+        if stored_job is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Job not found."
+            )
+        return StreamingResponse(
+            stream_stored_job_events(job_id, current_user.id, stored_job),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    async def event_stream():
+        queue = job.subscribe()
+        try:
+            snapshot = schemas.JobStatusResponse.model_validate(job).model_dump(mode="json")
+            yield format_sse("status", snapshot)
+            if job.done:
+                return
+
+            while True:
+                event = await queue.get()
+                yield format_sse(event["event"], event)
+                if event["event"] in ("completed", "failed"):
+                    return
+        finally:
+            job.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def stream_stored_job_events(job_id: str, user_id: int, stored_job: dict):
+    """ Follows a job running on another worker through its stored state, without per-token events """
+    snapshot = schemas.JobStatusResponse.model_validate(stored_job).model_dump(mode="json")
+    yield format_sse("status", snapshot)
+    while snapshot["status"] not in ("completed", "failed"):
+        await asyncio.sleep(JOB_STATE_POLL_SECONDS)
+        stored_job = await run_in_session(CRUD.ResearchSession.get_job, user_id, job_id)
+        if stored_job is None:
+            return
+        previous, snapshot = snapshot, schemas.JobStatusResponse.model_validate(stored_job).model_dump(mode="json")
+        if snapshot["status"] in ("completed", "failed"):
+            yield format_sse(snapshot["status"], {"event": snapshot["status"], **snapshot})
+        elif snapshot != previous:
+            yield format_sse("progress", {"event": "progress", "node": snapshot["current_node"], "completed": snapshot["completed_steps"], "total": snapshot["total_steps"]})
+
+def format_sse(event: str, data: dict):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
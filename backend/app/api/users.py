@@ -1,26 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
 from app.core.auth import Authorization
+from app.core.config import settings
 from app.db import schemas, models
-from app.db.database import get_db
+from app.db.database import AsyncSessionLocal, SessionLocal, get_request_db, run_db
 from app.utils import CRUD
 
-from typing import List
+from typing import List, Optional, Union
 
 router = APIRouter()
 
 @router.post("/signin", status_code=status.HTTP_201_CREATED, tags=["Users"])
-def signin(data: schemas.UserCreate, db = Depends(get_db)):
+async def signin(data: schemas.UserCreate, db = Depends(get_request_db)):
 
     try:
-        existing_user = db.query(models.User).filter((models.User.email == data.email.lower())).first()
+        existing_user = await run_db(db, CRUD.User.get_by_email, data.email)
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered",
             )
 
-        new_user = CRUD.User.create(db, data)
+        hashed_password = await Authorization.ahash_password(data.password)
+        new_user = await run_db(db, CRUD.User.create, data, hashed_password)
         access_token, refresh_token = Authorization.generate_creds(data = {"sub" : new_user.email})
 
         return {"access_token" : access_token, "refresh_token" : refresh_token}
@@ -34,20 +38,19 @@ def signin(data: schemas.UserCreate, db = Depends(get_db)):
         )
     
 @router.post("/signup", status_code=status.HTTP_200_OK, tags=["Users"])
-def signup(data: schemas.UserSignup, db = Depends(get_db)):
+async def signup(data: schemas.UserSignup, db = Depends(get_request_db)):
 
     try:
-        user = db.query(models.User).filter(models.User.email == data.email.lower()).first()
-        if not user or not Authorization.verify_password(data.password, user.password):
+        user = await run_db(db, CRUD.User.get_by_email, data.email)
+        if not user or not await Authorization.averify_password(data.password, user.password):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid email or password."
             )
 
-        if Authorization.verify_password(data.password, user.password):
-            access_token, refresh_token = Authorization.generate_creds(data={"sub": user.email})
+        access_token, refresh_token = Authorization.generate_creds(data={"sub": user.email})
 
-            return {"access_token": access_token, "refresh_tokken": refresh_token}
+        return {"access_token": access_token, "refresh_tokken": refresh_token}
         
     except HTTPException as e:
         raise e
@@ -57,17 +60,17 @@ def signup(data: schemas.UserSignup, db = Depends(get_db)):
             detail=f"detail: {e}"
         )
     
-@router.get("/get-sessions", status_code=status.HTTP_200_OK, tags=["Users"])
-def get_sessions(db = Depends(get_db), current_user = Depends(Authorization.get_current_user)):
+@router.get("/get-sessions", response_model=schemas.SessionListResponse, status_code=status.HTTP_200_OK, tags=["Users"])
+async def get_sessions(
+    limit: int = Query(settings.sessions_page_size, ge=1, le=settings.sessions_max_page_size),
+    cursor: Optional[str] = None,
+    db = Depends(get_request_db),
+    current_user = Depends(Authorization.get_current_user)
+):
 
     try:
-        sessions = CRUD.ChatHistory.get_sessions(db, current_user.id)
-        if not sessions:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="No sessions found."
-            )
-        return {"sessions": sessions}
+        sessions, next_cursor = await run_db(db, CRUD.ResearchSession.get_sessions, current_user.id, limit, cursor)
+        return {"sessions": sessions, "next_cursor": next_cursor}
 
     except HTTPException as e:
         raise e
@@ -77,16 +80,35 @@ def get_sessions(db = Depends(get_db), current_user = Depends(Authorization.get_
             detail=f"detail: {e}"
         )
     
-@router.get("/get-session-history/{session_id}", response_model=List[schemas.SessionHistoryResponse], tags=["Users"])
-def get_session_history(session_id: str, db = Depends(get_db), current_user = Depends(Authorization.get_current_user)):
+@router.get("/get-session-history/{session_id}", response_model=List[Union[schemas.SessionHistoryResponse, schemas.SessionHistorySummary]], tags=["Users"])
+async def get_session_history(
+    session_id: str,
+    response: Response,
+    limit: int = Query(settings.history_page_size, ge=1, le=settings.history_max_page_size),
+    cursor: Optional[str] = None,
+    summary: bool = False,
+    stream: bool = False,
+    db = Depends(get_request_db),
+    current_user = Depends(Authorization.get_current_user)
+):
 
     try:
-        session_history = CRUD.ChatHistory.get_session_history(db, session_id)
-        if not session_history:
+        await run_db(db, CRUD.ResearchSession.get_owned, session_id, current_user.id)
+
+        if stream:
+            return StreamingResponse(
+                stream_session_history(session_id, current_user.id, cursor, summary),
+                media_type="application/json"
+            )
+
+        session_history, next_cursor = await run_db(db, CRUD.ChatHistory.get_session_history, session_id, current_user.id, limit, cursor, summary)
+        if not session_history and cursor is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Session history not found."
             )
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = next_cursor
         return session_history
 
     except HTTPException as e:
@@ -95,4 +117,48 @@ def get_session_history(session_id: str, db = Depends(get_db), current_user = De
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"detail: {e}"
-        )
\ No newline at end of file
+        )
+
+@router.get("/search-reports", response_model=schemas.ReportSearchResponse, tags=["Users"])
+async def search_reports(
+    q: str = Query(..., min_length=1, max_length=256),
+    limit: int = Query(settings.search_page_size, ge=1, le=settings.search_max_page_size),
+    cursor: Optional[str] = None,
+    db = Depends(get_request_db),
+    current_user = Depends(Authorization.get_current_user)
+):
+
+    try:
+        results, next_cursor = await run_db(db, CRUD.ChatHistory.search, current_user.id, q, limit, cursor)
+        return {"results": results, "next_cursor": next_cursor}
+
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"detail: {e}"
+        )
+
+async def stream_session_history(session_id: str, user_id: int, cursor: Optional[str], summary: bool):
+    """ The whole history as one JSON array, written row by row """
+    schema = schemas.SessionHistorySummary if summary else schemas.SessionHistoryResponse
+    yield "["
+    index = 0
+    # The request's session is closed before a streamed body is sent, so the stream owns its own
+    if settings.database_mode == "async":
+        async with AsyncSessionLocal() as db:
+            query = CRUD.ChatHistory.history_query(session_id, user_id, summary, cursor).execution_options(yield_per=20)
+            async for row in await db.stream(query):
+                yield ("," if index else "") + schema.model_validate(row).model_dump_json()
+                index += 1
+    else:
+        db = SessionLocal()
+        try:
+            rows = CRUD.ChatHistory.iter_session_history(db, session_id, user_id, cursor, summary)
+            while (row := await run_in_threadpool(next, rows, None)) is not None:
+                yield ("," if index else "") + schema.model_validate(row).model_dump_json()
+                index += 1
+        finally:
+            db.close()
+    yield "]"
@@ -1,13 +1,17 @@
 from datetime import datetime, timedelta
-from passlib.context import CryptContext
 from typing import Optional
 
 from app.core.config import settings
-from app.db.database import get_db
+from app.core.passwords import PasswordHasher, build_context
+from app.db.database import run_in_session
 from app.db import models
+from app.utils.cache import MemoryCache
 
+import asyncio
 import jwt
+import time
 from jwt.exceptions import InvalidTokenError
+from sqlalchemy import event, inspect
 
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException, status
@@ -17,9 +21,16 @@ ALGORITHM = settings.algorithm
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
 REFRESH_TOKEN_EXPIRE_DAYS = settings.REFRESH_TOKEN_EXPIRE_DAYS
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = build_context(settings.bcrypt_rounds)
+password_hasher = PasswordHasher(workers=settings.password_hash_workers, rounds=settings.bcrypt_rounds)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
+# Decoded tokens live until they expire, resolved users until the TTL or a change to the user row
+token_cache = MemoryCache(max_entries=settings.auth_cache_max_entries, ttl_seconds=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+user_cache = MemoryCache(max_entries=settings.auth_cache_max_entries, ttl_seconds=settings.auth_user_cache_ttl_seconds)
+# Lookups in flight per email, requests that miss the cache together share one query
+user_lookups: dict[str, asyncio.Task] = {}
+
 class Authorization():
 
     @staticmethod
@@ -30,6 +41,14 @@ class Authorization():
     def verify_password(plain_password: str, hashed_password: str):
         return pwd_context.verify(plain_password, hashed_password)
 
+    @staticmethod
+    async def ahash_password(password: str):
+        return await password_hasher.hash(password)
+
+    @staticmethod
+    async def averify_password(plain_password: str, hashed_password: str):
+        return await password_hasher.verify(plain_password, hashed_password)
+
     @staticmethod
     def generate_creds(data: dict, expires_delta: Optional[timedelta] = None):
         access = data.copy()
@@ -55,22 +74,78 @@ class Authorization():
             raise e
         
     @staticmethod
-    def get_current_user(token = Depends(oauth2_scheme), db = Depends(get_db)):
+    def decode_token(token: str):
+        """ jwt.decode, cached per token until the token expires """
+        payload = token_cache.get(token)
+        if payload is None:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            expires_in = payload["exp"] - time.time() if "exp" in payload else None
+            token_cache.set(token, payload, expires_in)
+        return payload
+
+    @staticmethod
+    def find_user(db, email: str):
+        user = db.query(models.User).filter(models.User.email == email).first()
+        if user is not None:
+            # Detached so the cached instance outlives the session
+            db.expunge(user)
+        return user
+
+    @staticmethod
+    async def load_user(email: str):
+        """ Looks the user up on a session of the configured database_mode, off the threadpool in async mode """
+        return await run_in_session(Authorization.find_user, email)
+
+    @staticmethod
+    async def cached_user(email: str):
+        """ The cached user, the database is only queried on a miss and once for concurrent misses """
+        user = user_cache.get(email)
+        if user is not None:
+            return user
+
+        lookup = user_lookups.get(email)
+        if lookup is None:
+            lookup = asyncio.ensure_future(Authorization.load_user(email))
+            user_lookups[email] = lookup
+            lookup.add_done_callback(lambda done: user_lookups.pop(email) if user_lookups.get(email) is done else None)
+
+        # Shielded so a disconnecting client does not cancel the lookup the other requests wait on
+        user = await asyncio.shield(lookup)
+        if user is not None:
+            user_cache.set(email, user)
+        return user
+
+    @staticmethod
+    def invalidate_user(email: str):
+        user_cache.delete(email)
+        # Requests after the change start a fresh lookup instead of joining one that may read the old row
+        user_lookups.pop(email, None)
+
+    @staticmethod
+    async def get_current_user(token = Depends(oauth2_scheme)):
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
         try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            payload = Authorization.decode_token(token)
             email = payload.get("sub")
             if email is None:
                 raise credentials_exception
         except InvalidTokenError:
             raise credentials_exception
 
-        user = db.query(models.User).filter(models.User.email == email).first()
+        user = await Authorization.cached_user(email)
         if user is None:
             raise credentials_exception
         return user
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def invalidate_cached_user(mapper, connection, target):
+    """ Drops a changed user from the cache under its current and, after an email change, its previous email """
+    Authorization.invalidate_user(target.email)
+    for email in inspect(target).attrs.email.history.deleted:
+        Authorization.invalidate_user(email)
         
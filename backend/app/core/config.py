@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
-from langchain_openai import ChatOpenAI
+
+from app.core.rate_limit import OpenAIRateLimiter, RateLimitCallback
 
 class Settings(BaseSettings):
     postgres_url: str
@@ -10,6 +11,118 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int
     REFRESH_TOKEN_EXPIRE_DAYS: int
 
+    # "async" serves requests from an asyncpg engine, "sync" from the psycopg2 engine through the threadpool
+    database_mode: str = "async"
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: int = 30
+    db_pool_pre_ping: bool = True
+    db_pool_recycle: int = 1800
+    # 0 disables the server-side statement timeout
+    db_statement_timeout_ms: int = 30000
+
+    # "memory" keeps sessions in-process, "postgres" shares them across workers and restarts
+    checkpointer_backend: str = "memory"
+    checkpointer_pool_size: int = 10
+    # Persist a checkpoint after every step so finished interviews survive a worker restart mid-report.
+    # False writes only when a run finishes or hits an interrupt, cheaper but a restart re-runs the whole fan-out
+    checkpoint_during: bool = True
+
+    # Background report jobs started by approving the analysts
+    report_workers: int = 4
+    report_queue_size: int = 100
+    report_job_retention_seconds: int = 3600
+    # Unfinished jobs whose worker misses three heartbeats are marked failed by the other workers
+    report_job_heartbeat_seconds: int = 30
+
+    # Tavily and Wikipedia results, "memory" or "postgres" (memory LRU in front of the cache_entries table)
+    search_cache_enabled: bool = True
+    search_cache_backend: str = "memory"
+    search_cache_ttl_seconds: int = 86400
+    search_cache_max_entries: int = 1024
+    search_cache_max_shared_entries: int = 100000
+    # Query variants produced by the single query-generation call each interview turn
+    search_query_variants: int = 1
+
+    # Token budget for the retrieved documents sent to answer_question and write_section, per model
+    context_token_budget: int = 8000
+    context_token_budgets: dict[str, int] = {"gpt-4o": 16000}
+    context_min_document_tokens: int = 200
+
+    # Opt-in LLM response cache, comma-separated graph node names (e.g. "create_analysts,generate_session_name")
+    llm_cache_nodes: str = ""
+    llm_cache_backend: str = "memory"
+    llm_cache_ttl_seconds: int = 604800
+    llm_cache_max_entries: int = 512
+    llm_cache_max_shared_entries: int = 50000
+    llm_cache_sqlite_path: str = "llm_cache.sqlite3"
+
+    # Uvicorn worker processes, the compose file passes the BACKEND_WORKERS it starts uvicorn with
+    backend_workers: int = 1
+
+    # OpenAI limits for the whole deployment, 0 disables a bucket. 429s are retried with backoff by the OpenAI client.
+    # The buckets live in each worker process, so every worker gets an equal share of these limits
+    openai_model: str = "gpt-4o"
+    openai_rpm_limit: int = 500
+    openai_tpm_limit: int = 30000
+    openai_completion_token_estimate: int = 1000
+    openai_max_retries: int = 6
+
+    # Expert answers per interview
+    max_num_turns: int = 2
+
+    # Interview fan-out limits, extra interviews wait for a free slot
+    max_analysts: int = 8
+    max_concurrent_interviews: int = 16
+    max_concurrent_interviews_per_session: int = 4
+
+    # "hierarchical" merges sections in batches and builds intro/conclusion from a digest, "flat" sends every section
+    report_reduce_mode: str = "hierarchical"
+    report_reduce_batch_size: int = 4
+
+    # LLM usage records are buffered and inserted into llm_usage in batches
+    usage_batch_size: int = 50
+    usage_flush_interval_seconds: float = 5.0
+
+    # Keyset pagination of the session sidebar
+    sessions_page_size: int = 50
+    sessions_max_page_size: int = 200
+    history_page_size: int = 20
+    history_max_page_size: int = 100
+
+    # bcrypt runs on a process pool so login bursts do not starve the request threads
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+
+    # Resolved users are cached per process, changes made by another worker show up after the TTL
+    auth_cache_max_entries: int = 10000
+    auth_user_cache_ttl_seconds: int = 60
+
+    # chat_history.response is stored as a zstd frame, the first dictionary compresses and all of them decompress
+    report_compression_level: int = 10
+    report_compression_dictionaries: str = ""
+    # Compresses reports written before the column was compressed, in the background after startup
+    report_compression_backfill: bool = True
+
+    # Full-text search over stored reports
+    search_language: str = "english"
+    search_page_size: int = 10
+    search_max_page_size: int = 50
+    search_index_backfill: bool = True
+
+    # Steady-state deployments can skip the CREATE DATABASE check and run "alembic upgrade head" as a deploy step
+    db_create_on_startup: bool = True
+    db_migrate_on_startup: bool = True
+    # Importing the agent, building the OpenAI client and compiling the graphs: "blocking", "background" or "off" (first request)
+    startup_warm_up: str = "background"
+
+    # /metrics is only mounted when enabled, and then requires "Authorization: Bearer <metrics_token>" if a token is set
+    metrics_enabled: bool = False
+    metrics_token: str = ""
+    # Each worker writes its gauges at this interval so a multiprocess scrape sees all of them
+    metrics_refresh_interval_seconds: float = 5.0
+
+    log_level: str = "INFO"
 
     class Config:
         env_file = ".env"
@@ -17,4 +130,33 @@ class Settings(BaseSettings):
 
 settings = Settings()
 
-llm = ChatOpenAI(openai_api_key=settings.openai_api_key, model_name="gpt-4o", temperature=0)
\ No newline at end of file
+def worker_share(limit: int):
+    """ One worker's share of a deployment-wide per-minute limit, 0 keeps the bucket disabled """
+    return max(limit // max(settings.backend_workers, 1), 1) if limit > 0 else 0
+
+rate_limiter = OpenAIRateLimiter(rpm=worker_share(settings.openai_rpm_limit), tpm=worker_share(settings.openai_tpm_limit))
+
+_llm = None
+
+def get_llm():
+    """ The shared OpenAI client, built on first use so importing the settings stays cheap """
+    global _llm
+
+    if _llm is None:
+        from langchain_openai import ChatOpenAI
+
+        _llm = ChatOpenAI(
+            openai_api_key=settings.openai_api_key,
+            model_name=settings.openai_model,
+            temperature=0,
+            max_retries=settings.openai_max_retries,
+            stream_usage=True,
+            callbacks=[RateLimitCallback(rate_limiter, settings.openai_model, settings.openai_completion_token_estimate)]
+        )
+    return _llm
+
+def __getattr__(name: str):
+    # "from app.core.config import llm" keeps working and builds the client at that point
+    if name == "llm":
+        return get_llm()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
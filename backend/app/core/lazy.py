@@ -0,0 +1,27 @@
+import importlib
+import threading
+
+class LazyModule:
+    """ Stands in for a module and imports it on first attribute access """
+
+    def __init__(self, name: str):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self.__dict__["_module"] is not None
+
+    def load(self):
+        if self.__dict__["_module"] is None:
+            with self.__dict__["_lock"]:
+                if self.__dict__["_module"] is None:
+                    self.__dict__["_module"] = importlib.import_module(self.__dict__["_name"])
+        return self.__dict__["_module"]
+
+    def __getattr__(self, attribute: str):
+        return getattr(self.load(), attribute)
+
+    def __setattr__(self, attribute: str, value):
+        setattr(self.load(), attribute, value)
@@ -0,0 +1,52 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Optional
+import asyncio
+
+from passlib.context import CryptContext
+
+# Imported by the pool's worker processes, so it stays free of application imports
+pwd_context: Optional[CryptContext] = None
+
+def build_context(rounds: int):
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+
+def configure(rounds: int):
+    global pwd_context
+    pwd_context = build_context(rounds)
+
+def hash_password(password: str):
+    return pwd_context.hash(password)
+
+def verify_password(plain_password: str, hashed_password: str):
+    return pwd_context.verify(plain_password, hashed_password)
+
+class PasswordHasher:
+    """ Runs bcrypt on a bounded pool of processes, keeping login bursts off the request threads """
+
+    def __init__(self, workers: int, rounds: int):
+        self.workers = workers
+        self.rounds = rounds
+        self.pool: Optional[ProcessPoolExecutor] = None
+
+    def _executor(self):
+        # Spawned workers start on first use and import only this module
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=get_context("spawn"),
+                initializer=configure,
+                initargs=(self.rounds,)
+            )
+        return self.pool
+
+    async def hash(self, password: str):
+        return await asyncio.get_running_loop().run_in_executor(self._executor(), hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str):
+        return await asyncio.get_running_loop().run_in_executor(self._executor(), verify_password, plain_password, hashed_password)
+
+    def stop(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
@@ -0,0 +1,160 @@
+from collections import OrderedDict, deque
+from typing import Any, Optional
+from uuid import UUID
+import asyncio
+import time
+
+import tiktoken
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.messages import BaseMessage, get_buffer_string
+from langchain_core.outputs import LLMResult
+
+class TokenBucket:
+    """ Refills continuously up to its per-minute capacity, consumption may go negative to settle debt """
+
+    def __init__(self, per_minute: int):
+        self.capacity = per_minute
+        self.available = float(per_minute)
+        self.rate = per_minute / 60
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float):
+        """ Seconds until the bucket holds the amount, capped at its capacity so large requests still run """
+        self.refill()
+        missing = min(amount, self.capacity) - self.available
+        return max(missing / self.rate, 0.0)
+
+    def consume(self, amount: float):
+        self.refill()
+        self.available -= amount
+
+class OpenAIRateLimiter:
+    """ Shared requests-per-minute and tokens-per-minute limiter that serves waiting sessions round-robin """
+
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.queues: OrderedDict[str, deque] = OrderedDict()
+        self.wakeup: Optional[asyncio.Event] = None
+        self.dispatcher: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self):
+        return self.requests is not None or self.tokens is not None
+
+    @property
+    def queue_depth(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    @property
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth,
+            "sessions_waiting": len(self.queues),
+            "rpm_limit": self.requests.capacity if self.requests else None,
+            "tpm_limit": self.tokens.capacity if self.tokens else None,
+            "requests_available": self.requests.available if self.requests else None,
+            "tokens_available": self.tokens.available if self.tokens else None,
+        }
+
+    async def acquire(self, session_id: str, estimated_tokens: int):
+        if not self.enabled:
+            return
+
+        if self.dispatcher is None or self.dispatcher.done():
+            self.wakeup = asyncio.Event()
+            self.dispatcher = asyncio.create_task(self._dispatch())
+
+        future = asyncio.get_running_loop().create_future()
+        self.queues.setdefault(session_id, deque()).append((future, estimated_tokens))
+        self.wakeup.set()
+        await future
+
+    def adjust(self, estimated_tokens: int, actual_tokens: int):
+        """ Settles the difference between the pre-estimate and the usage OpenAI reported """
+        if self.tokens is not None:
+            self.tokens.consume(actual_tokens - estimated_tokens)
+
+    def _wait_time(self, estimated_tokens: int):
+        waits = [0.0]
+        if self.requests is not None:
+            waits.append(self.requests.wait_time(1))
+        if self.tokens is not None:
+            waits.append(self.tokens.wait_time(estimated_tokens))
+        return max(waits)
+
+    async def _dispatch(self):
+        while True:
+            if not self.queues:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+
+            # Serve the session at the front, then rotate it to the back so every session gets a turn
+            session_id, queue = next(iter(self.queues.items()))
+            future, estimated_tokens = queue[0]
+            if future.cancelled():
+                queue.popleft()
+            else:
+                wait = self._wait_time(estimated_tokens)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+
+                queue.popleft()
+                if self.requests is not None:
+                    self.requests.consume(1)
+                if self.tokens is not None:
+                    self.tokens.consume(estimated_tokens)
+                future.set_result(None)
+
+            del self.queues[session_id]
+            if queue:
+                self.queues[session_id] = queue
+
+class RateLimitCallback(AsyncCallbackHandler):
+    """ Holds each chat model call until the limiter admits it, then reconciles with the reported usage """
+
+    raise_error = True
+
+    def __init__(self, limiter: OpenAIRateLimiter, model: str, completion_token_estimate: int):
+        self.limiter = limiter
+        self.completion_token_estimate = completion_token_estimate
+        self.estimates: dict[UUID, int] = {}
+        try:
+            self.encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            self.encoding = tiktoken.get_encoding("o200k_base")
+
+    async def on_chat_model_start(self, serialized: dict[str, Any], messages: list[list[BaseMessage]], *, run_id: UUID, metadata: Optional[dict[str, Any]] = None, **kwargs: Any):
+        prompt = "\n".join(get_buffer_string(batch) for batch in messages)
+        estimated_tokens = len(self.encoding.encode(prompt)) + self.completion_token_estimate
+        self.estimates[run_id] = estimated_tokens
+
+        session_id = str((metadata or {}).get("thread_id", "default"))
+        await self.limiter.acquire(session_id, estimated_tokens)
+
+    async def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        estimated_tokens = self.estimates.pop(run_id, None)
+        if estimated_tokens is None:
+            return
+
+        actual_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    actual_tokens += usage["total_tokens"]
+        if actual_tokens:
+            self.limiter.adjust(estimated_tokens, actual_tokens)
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        estimated_tokens = self.estimates.pop(run_id, None)
+        if estimated_tokens is not None:
+            # A rejected request did not spend its tokens
+            self.limiter.adjust(estimated_tokens, 0)
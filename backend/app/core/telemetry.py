@@ -0,0 +1,181 @@
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Optional
+from uuid import UUID
+import asyncio
+import hmac
+import logging
+import os
+import time
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import LLMResult
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, make_asgi_app, multiprocess
+from sqlalchemy import event
+
+logger = logging.getLogger("app.telemetry")
+
+NODE_DURATION = Histogram(
+    "research_node_duration_seconds", "Wall time of each research graph node.", ["node"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+)
+NODE_ERRORS = Counter("research_node_errors_total", "Research graph nodes that raised.", ["node"])
+EXTERNAL_CALL_DURATION = Histogram(
+    "external_call_duration_seconds", "Wall time of calls to OpenAI, Tavily and Wikipedia.", ["service"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+)
+EXTERNAL_CALL_ERRORS = Counter("external_call_errors_total", "Failed calls to external services.", ["service"])
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Wall time of database statements.", ["operation"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a connection from the pool.", ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30)
+)
+
+def setup_logging(level: str):
+    logging.basicConfig(level=level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+gauges: dict[str, tuple[Gauge, Callable[[], float]]] = {}
+
+def register_gauge(name: str, description: str, read, multiprocess_mode: str = "livesum"):
+    """ Exports a value of this process, e.g. a queue depth, combined across workers with the multiprocess_mode """
+    # set_function is ignored in multiprocess mode, so the values are written by refresh_gauges instead
+    gauges[name] = (Gauge(name, description, multiprocess_mode=multiprocess_mode), read)
+
+def refresh_gauges():
+    for name, (gauge, read) in gauges.items():
+        try:
+            gauge.set(read())
+        except Exception as e:
+            logger.debug(f"Failed to read gauge {name}: {e}")
+
+async def refresh_gauges_periodically(interval_seconds: float):
+    """ Keeps the gauges of every worker current, the scrape may be served by any of them """
+    while True:
+        refresh_gauges()
+        await asyncio.sleep(interval_seconds)
+
+def mark_process_dead():
+    """ Drops the live gauges of this worker from the multiprocess aggregate on shutdown """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
+
+def metrics_app(token: str = ""):
+    """ ASGI app serving the Prometheus metrics, aggregated across workers when PROMETHEUS_MULTIPROC_DIR is set """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        prometheus_app = make_asgi_app(registry=registry)
+    else:
+        prometheus_app = make_asgi_app()
+
+    async def app(scope, receive, send):
+        if scope["type"] == "http" and token:
+            authorization = dict(scope["headers"]).get(b"authorization", b"").decode()
+            if not hmac.compare_digest(authorization, f"Bearer {token}"):
+                await send({"type": "http.response.start", "status": 401, "headers": [(b"www-authenticate", b"Bearer")]})
+                await send({"type": "http.response.body", "body": b""})
+                return
+        refresh_gauges()
+        await prometheus_app(scope, receive, send)
+
+    return app
+
+@asynccontextmanager
+async def external_call(service: str, **attributes):
+    """ Times a call to an external service and logs it as a span """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        EXTERNAL_CALL_ERRORS.labels(service).inc()
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        EXTERNAL_CALL_DURATION.labels(service).observe(duration)
+        logger.debug("span service=%s duration_ms=%.1f %s", service, duration * 1000, format_attributes(attributes))
+
+def instrument_engine(engine):
+    """ Records the duration of every statement run on a SQLAlchemy engine """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["query_start"].pop()
+        operation = statement.lstrip().split(" ", 1)[0].upper()
+        DB_QUERY_DURATION.labels(operation).observe(duration)
+
+def timed_pool(pool_class, engine_name: str):
+    """ Pool class recording how long each checkout waits for a free connection """
+
+    class TimedPool(pool_class):
+
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                DB_POOL_CHECKOUT_WAIT.labels(engine_name).observe(time.perf_counter() - start)
+
+    TimedPool.__name__ = f"Timed{pool_class.__name__}"
+    return TimedPool
+
+def format_attributes(attributes: dict):
+    return " ".join(f"{key}={value}" for key, value in attributes.items() if value is not None)
+
+class TracingCallback(AsyncCallbackHandler):
+    """ Times graph nodes and OpenAI calls of a research run, logging each as a span tagged with the session """
+
+    def __init__(self):
+        self.runs: dict[UUID, tuple] = {}
+
+    async def on_chain_start(self, serialized: dict[str, Any], inputs: dict[str, Any], *, run_id: UUID, metadata: Optional[dict[str, Any]] = None, **kwargs: Any):
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node")
+        # Only the run of the node itself, not the runnables nested inside it
+        if node is not None and kwargs.get("name") == node:
+            self.runs[run_id] = ("node", node, metadata.get("thread_id"), time.perf_counter())
+
+    async def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any):
+        self._finish(run_id)
+
+    async def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._finish(run_id, error)
+
+    async def on_chat_model_start(self, serialized: dict[str, Any], messages: list[list[BaseMessage]], *, run_id: UUID, metadata: Optional[dict[str, Any]] = None, **kwargs: Any):
+        metadata = metadata or {}
+        self.runs[run_id] = ("openai", metadata.get("langgraph_node"), metadata.get("thread_id"), time.perf_counter())
+
+    async def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        self._finish(run_id)
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._finish(run_id, error)
+
+    def _finish(self, run_id: UUID, error: Optional[BaseException] = None):
+        run = self.runs.pop(run_id, None)
+        if run is None:
+            return
+
+        kind, node, session_id, start = run
+        duration = time.perf_counter() - start
+        if kind == "node":
+            NODE_DURATION.labels(node).observe(duration)
+            if error is not None:
+                NODE_ERRORS.labels(node).inc()
+        else:
+            EXTERNAL_CALL_DURATION.labels("openai").observe(duration)
+            if error is not None:
+                EXTERNAL_CALL_ERRORS.labels("openai").inc()
+
+        logger.debug(
+            "span %s=%s session=%s duration_ms=%.1f%s",
+            kind, node, session_id, duration * 1000, f" error={error!r}" if error is not None else ""
+        )
+
+tracing_callback = TracingCallback()
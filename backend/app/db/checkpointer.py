@@ -0,0 +1,59 @@
+from sqlalchemy.engine.url import make_url
+
+from app.core.config import settings
+
+_checkpointer = None
+_pool = None
+
+def postgres_conninfo():
+    """ Converts the SQLAlchemy POSTGRES_URL into a libpq connection string """
+    url = make_url(settings.postgres_url).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+def get_checkpointer():
+    """ Returns the process-wide checkpointer for the backend selected in settings """
+    global _checkpointer, _pool
+
+    if _checkpointer is not None:
+        return _checkpointer
+
+    backend = settings.checkpointer_backend.lower()
+    if backend == "memory":
+        from langgraph.checkpoint.memory import MemorySaver
+
+        _checkpointer = MemorySaver()
+
+    elif backend == "postgres":
+        from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+        from psycopg.rows import dict_row
+        from psycopg_pool import AsyncConnectionPool
+
+        _pool = AsyncConnectionPool(
+            conninfo=postgres_conninfo(),
+            min_size=1,
+            max_size=settings.checkpointer_pool_size,
+            kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+            open=False
+        )
+        _checkpointer = AsyncPostgresSaver(_pool)
+
+    else:
+        raise ValueError(f"Unknown checkpointer backend '{settings.checkpointer_backend}'.")
+
+    return _checkpointer
+
+async def open_checkpointer():
+    """ Opens the connection pool and creates the checkpoint tables if needed """
+    checkpointer = get_checkpointer()
+    if _pool is not None:
+        await _pool.open()
+        await checkpointer.setup()
+    return checkpointer
+
+async def close_checkpointer():
+    global _checkpointer, _pool
+
+    if _pool is not None:
+        await _pool.close()
+    _checkpointer = None
+    _pool = None
@@ -0,0 +1,156 @@
+""" zstd compression of stored reports.
+
+    python -m app.db.compression train --output reports.dict
+    python -m app.db.compression backfill
+"""
+
+from pathlib import Path
+from typing import Optional
+import argparse
+import logging
+import threading
+import time
+
+import zstandard as zstd
+from sqlalchemy import LargeBinary, func, literal, select, text, type_coerce, update
+from sqlalchemy.types import TypeDecorator
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+BACKFILL_LOCK_ID = 72910432
+
+class ReportCodec:
+    """ Compresses with the first configured dictionary and decompresses frames written with any of them """
+
+    def __init__(self, level: int, dictionary_paths: list[str]):
+        self.level = level
+        self.dictionaries = [zstd.ZstdCompressionDict(Path(path).read_bytes()) for path in dictionary_paths]
+        for dictionary in self.dictionaries[:1]:
+            dictionary.precompute_compress(level=level)
+        self.by_id = {dictionary.dict_id(): dictionary for dictionary in self.dictionaries}
+        # zstd contexts are not thread-safe, each thread keeps its own
+        self.local = threading.local()
+
+    def compressor(self):
+        if not hasattr(self.local, "compressor"):
+            dictionary = self.dictionaries[0] if self.dictionaries else None
+            self.local.compressor = zstd.ZstdCompressor(level=self.level, dict_data=dictionary)
+        return self.local.compressor
+
+    def decompressor(self, dict_id: int):
+        decompressors = self.local.__dict__.setdefault("decompressors", {})
+        if dict_id not in decompressors:
+            if dict_id and dict_id not in self.by_id:
+                raise ValueError(f"Report was compressed with unknown zstd dictionary {dict_id}.")
+            decompressors[dict_id] = zstd.ZstdDecompressor(dict_data=self.by_id.get(dict_id))
+        return decompressors[dict_id]
+
+    def compress(self, value: str):
+        return self.compressor().compress(value.encode("utf-8"))
+
+    def decompress(self, data: bytes):
+        # Rows not yet reached by the backfill are plain UTF-8
+        if not data.startswith(ZSTD_MAGIC):
+            return data.decode("utf-8")
+        dict_id = zstd.get_frame_parameters(data).dict_id
+        return self.decompressor(dict_id).decompress(data).decode("utf-8")
+
+def dictionary_paths():
+    return [path.strip() for path in settings.report_compression_dictionaries.split(",") if path.strip()]
+
+codec = ReportCodec(settings.report_compression_level, dictionary_paths())
+
+class CompressedText(TypeDecorator):
+    """ Text stored as a zstd frame in a bytea column, decoded transparently on load """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value: Optional[str], dialect):
+        if value is None:
+            return None
+        return codec.compress(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return codec.decompress(bytes(value))
+
+def pending_reports_query(after_id: int, batch_size: int):
+    from app.db import models
+
+    prefix = func.substring(type_coerce(models.ChatHistory.response, LargeBinary), 1, 4)
+    return select(models.ChatHistory.id, models.ChatHistory.response).where(
+        models.ChatHistory.id > after_id,
+        models.ChatHistory.response.isnot(None),
+        prefix != literal(ZSTD_MAGIC, LargeBinary)
+    ).order_by(models.ChatHistory.id).limit(batch_size)
+
+def compress_pending_reports(batch_size: int = 200, pause_seconds: float = 0.1, stop: Optional[threading.Event] = None):
+    """ Compresses reports left as plain UTF-8 by the column migration, one committed batch at a time """
+    from app.db import models
+    from app.db.database import engine
+
+    compressed = 0
+    with engine.connect() as connection:
+        # Every worker starts the backfill, one of them does the work
+        if not connection.execute(text("SELECT pg_try_advisory_lock(:lock_id)"), {"lock_id": BACKFILL_LOCK_ID}).scalar():
+            return compressed
+        try:
+            after_id = 0
+            while stop is None or not stop.is_set():
+                rows = connection.execute(pending_reports_query(after_id, batch_size)).all()
+                if not rows:
+                    break
+                for row in rows:
+                    connection.execute(update(models.ChatHistory).where(models.ChatHistory.id == row.id).values(response=row.response))
+                connection.commit()
+
+                compressed += len(rows)
+                after_id = rows[-1].id
+                time.sleep(pause_seconds)
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": BACKFILL_LOCK_ID})
+            connection.commit()
+
+    if compressed:
+        logger.info(f"Compressed {compressed} stored reports.")
+    return compressed
+
+def train_dictionary(output: str, size: int, samples: int):
+    """ Trains a zstd dictionary on the most recent reports """
+    from app.db import models
+    from app.db.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        reports = db.execute(
+            select(models.ChatHistory.response).where(models.ChatHistory.response.isnot(None)).order_by(models.ChatHistory.id.desc()).limit(samples)
+        ).scalars().all()
+    finally:
+        db.close()
+
+    dictionary = zstd.train_dictionary(size, [report.encode("utf-8") for report in reports])
+    Path(output).write_bytes(dictionary.as_bytes())
+    print(f"Trained dictionary {dictionary.dict_id()} on {len(reports)} reports, written to {output}.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintenance of compressed reports.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train = commands.add_parser("train", help="Train a compression dictionary on stored reports.")
+    train.add_argument("--output", required=True, help="Dictionary file to write.")
+    train.add_argument("--size", type=int, default=112640, help="Dictionary size in bytes.")
+    train.add_argument("--samples", type=int, default=2000, help="Reports to train on.")
+
+    backfill = commands.add_parser("backfill", help="Compress reports still stored as plain text.")
+    backfill.add_argument("--batch-size", type=int, default=200, help="Rows per committed batch.")
+
+    args = parser.parse_args()
+    if args.command == "train":
+        train_dictionary(args.output, args.size, args.samples)
+    else:
+        print(f"Compressed {compress_pending_reports(args.batch_size)} reports.")
@@ -1,17 +1,42 @@
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import create_engine, text
 from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
+from fastapi.concurrency import run_in_threadpool
 from pydantic_settings import BaseSettings
 
 from app.core.config import settings
+from app.core.telemetry import instrument_engine, timed_pool
+
+import logging
+
+logger = logging.getLogger(__name__)
 
 POSTGRES_URL = settings.postgres_url
+ASYNC_POSTGRES_URL = make_url(POSTGRES_URL).set(drivername="postgresql+asyncpg")
+
+pool_options = dict(
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_pre_ping=settings.db_pool_pre_ping,
+    pool_recycle=settings.db_pool_recycle,
+)
+sync_connect_args = {"options": f"-c statement_timeout={settings.db_statement_timeout_ms}"} if settings.db_statement_timeout_ms else {}
+async_connect_args = {"server_settings": {"statement_timeout": str(settings.db_statement_timeout_ms)}} if settings.db_statement_timeout_ms else {}
 
-engine = create_engine(POSTGRES_URL)
+engine = create_engine(POSTGRES_URL, poolclass=timed_pool(QueuePool, "sync"), connect_args=sync_connect_args, **pool_options)
+instrument_engine(engine)
+
+# The asyncpg engine connects lazily, so it costs nothing while database_mode is "sync"
+async_engine = create_async_engine(ASYNC_POSTGRES_URL, poolclass=timed_pool(AsyncAdaptedQueuePool, "async"), connect_args=async_connect_args, **pool_options)
+instrument_engine(async_engine.sync_engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
@@ -34,18 +59,18 @@ def create_database():
             result = connection.execute(db_exists_query).scalar_one_or_none()
 
             if result is None:
-                print(f"Database '{db_name}' does not exist. Attempting to create it...")
+                logger.info(f"Database '{db_name}' does not exist. Attempting to create it...")
                 try:
                     create_db_query = text(f"CREATE DATABASE {db_name}")
                     connection.execute(create_db_query)
-                    print(f"Database '{db_name}' created successfully.")
+                    logger.info(f"Database '{db_name}' created successfully.")
                 except Exception as e:
-                    print(f"Error creating database '{db_name}': {e}")
+                    logger.error(f"Error creating database '{db_name}': {e}")
                     raise
             else:
-                print(f"Database '{db_name}' already exists. Skipping creation.")
+                logger.info(f"Database '{db_name}' already exists. Skipping creation.")
     except Exception as e:
-        print(f"An error occurred during database existence check or creation: {e}")
+        logger.error(f"An error occurred during database existence check or creation: {e}")
         raise
 
 def get_db():
@@ -53,4 +78,41 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_request_db():
+    """ Session of the configured database_mode, to be used with run_db """
+    if settings.database_mode == "async":
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+async def run_db(db, function, *args):
+    """ Runs a sync CRUD function on either kind of session without holding a threadpool thread in async mode """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(function, *args)
+    return await run_in_threadpool(function, db, *args)
+
+async def run_in_session(function, *args):
+    """ run_db on a fresh session, for work outside of a request """
+    if settings.database_mode == "async":
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(function, *args)
+
+    def run():
+        db = SessionLocal()
+        try:
+            return function(db, *args)
+        finally:
+            db.close()
+
+    return await run_in_threadpool(run)
\ No newline at end of file
@@ -0,0 +1,21 @@
+from pathlib import Path
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_PATH = Path(__file__).parent / "migrations"
+
+def alembic_config():
+    from alembic.config import Config
+
+    config = Config()
+    config.set_main_option("script_location", str(MIGRATIONS_PATH))
+    return config
+
+def upgrade_database():
+    """ Brings the schema to the latest migration, databases created by create_all are adopted by the baseline """
+    from alembic import command
+
+    logger.info("Applying database migrations...")
+    command.upgrade(alembic_config(), "head")
@@ -0,0 +1,87 @@
+"""baseline schema previously created by Base.metadata.create_all
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Existing deployments already have these tables from create_all, only missing ones are created
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("first_name", sa.String()),
+            sa.Column("last_name", sa.String()),
+            sa.Column("email", sa.String()),
+            sa.Column("password", sa.String()),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("updated_at", sa.DateTime()),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_first_name", "users", ["first_name"])
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if "chat_history" not in existing:
+        op.create_table(
+            "chat_history",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+            sa.Column("session_id", sa.String()),
+            sa.Column("session_name", sa.String()),
+            sa.Column("message", sa.String()),
+            sa.Column("response", sa.String()),
+            sa.Column("created_at", sa.DateTime()),
+        )
+        op.create_index("ix_chat_history_id", "chat_history", ["id"])
+        op.create_index("ix_chat_history_user_id", "chat_history", ["user_id"])
+        op.create_index("ix_chat_history_session_id", "chat_history", ["session_id"])
+
+    if "cache_entries" not in existing:
+        op.create_table(
+            "cache_entries",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("namespace", sa.String(), nullable=False),
+            sa.Column("key", sa.String(), nullable=False),
+            sa.Column("value", sa.JSON()),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("expires_at", sa.DateTime()),
+        )
+        op.create_index("ix_cache_entries_id", "cache_entries", ["id"])
+        op.create_index("ix_cache_entries_created_at", "cache_entries", ["created_at"])
+        op.create_index("ix_cache_entries_expires_at", "cache_entries", ["expires_at"])
+        op.create_index("ix_cache_entries_namespace_key", "cache_entries", ["namespace", "key"], unique=True)
+
+    if "llm_usage" not in existing:
+        op.create_table(
+            "llm_usage",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+            sa.Column("session_id", sa.String()),
+            sa.Column("node", sa.String()),
+            sa.Column("model", sa.String()),
+            sa.Column("prompt_tokens", sa.Integer()),
+            sa.Column("completion_tokens", sa.Integer()),
+            sa.Column("total_tokens", sa.Integer()),
+            sa.Column("latency_ms", sa.Float()),
+            sa.Column("created_at", sa.DateTime()),
+        )
+        op.create_index("ix_llm_usage_id", "llm_usage", ["id"])
+        op.create_index("ix_llm_usage_user_id", "llm_usage", ["user_id"])
+        op.create_index("ix_llm_usage_session_id", "llm_usage", ["session_id"])
+        op.create_index("ix_llm_usage_user_id_created_at", "llm_usage", ["user_id", "created_at"])
+
+def downgrade():
+    op.drop_table("llm_usage")
+    op.drop_table("cache_entries")
+    op.drop_table("chat_history")
+    op.drop_table("users")
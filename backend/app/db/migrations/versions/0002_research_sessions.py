@@ -0,0 +1,62 @@
+"""research_sessions table and session-level indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "research_sessions",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("name", sa.String()),
+        sa.Column("topic", sa.String()),
+        sa.Column("status", sa.String(), nullable=False, server_default="analysts"),
+        sa.Column("reports", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("total_tokens", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.create_index("ix_research_sessions_user_id_created_at", "research_sessions", ["user_id", "created_at"])
+
+    # One session per session_id seen in the history, named and timed after its first report. Legacy rows without a timestamp date from the migration
+    op.execute("""
+        INSERT INTO research_sessions (id, user_id, name, topic, status, reports, total_tokens, created_at, updated_at)
+        SELECT DISTINCT ON (session_id)
+            session_id, user_id, session_name, message, 'completed',
+            COUNT(*) OVER (PARTITION BY session_id), 0,
+            COALESCE(MIN(created_at) OVER (PARTITION BY session_id), now()), COALESCE(MAX(created_at) OVER (PARTITION BY session_id), now())
+        FROM chat_history
+        WHERE session_id IS NOT NULL AND user_id IS NOT NULL
+        ORDER BY session_id, created_at
+    """)
+    op.execute("""
+        UPDATE research_sessions
+        SET total_tokens = usage.total_tokens
+        FROM (SELECT session_id, SUM(total_tokens) AS total_tokens FROM llm_usage GROUP BY session_id) AS usage
+        WHERE usage.session_id = research_sessions.id
+    """)
+    # Rows that could not be attributed to a session would violate the foreign key
+    op.execute("""
+        UPDATE chat_history SET session_id = NULL
+        WHERE session_id IS NOT NULL AND session_id NOT IN (SELECT id FROM research_sessions)
+    """)
+
+    op.create_foreign_key("fk_chat_history_session_id", "chat_history", "research_sessions", ["session_id"], ["id"])
+    op.create_index("ix_chat_history_session_id_created_at", "chat_history", ["session_id", "created_at"])
+    op.drop_index("ix_chat_history_session_id", table_name="chat_history")
+
+def downgrade():
+    op.create_index("ix_chat_history_session_id", "chat_history", ["session_id"])
+    op.drop_index("ix_chat_history_session_id_created_at", table_name="chat_history")
+    op.drop_constraint("fk_chat_history_session_id", "chat_history", type_="foreignkey")
+    op.drop_index("ix_research_sessions_user_id_created_at", table_name="research_sessions")
+    op.drop_table("research_sessions")
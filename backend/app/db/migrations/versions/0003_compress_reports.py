@@ -0,0 +1,35 @@
+"""store chat_history.response as zstd-compressed bytea
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Existing reports become plain UTF-8 bytes, read as such until the background backfill compresses them
+    op.alter_column(
+        "chat_history", "response",
+        type_=sa.LargeBinary(),
+        postgresql_using="convert_to(response, 'UTF8')"
+    )
+
+def downgrade():
+    from app.db.compression import codec
+
+    connection = op.get_bind()
+    op.add_column("chat_history", sa.Column("response_text", sa.String()))
+    rows = connection.execute(sa.text("SELECT id, response FROM chat_history WHERE response IS NOT NULL"))
+    for row in rows:
+        connection.execute(
+            sa.text("UPDATE chat_history SET response_text = :response WHERE id = :id"),
+            {"id": row.id, "response": codec.decompress(bytes(row.response))}
+        )
+    op.drop_column("chat_history", "response")
+    op.alter_column("chat_history", "response_text", new_column_name="response")
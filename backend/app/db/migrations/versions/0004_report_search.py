@@ -0,0 +1,23 @@
+"""full-text search vector on chat_history
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Filled on insert by the application and for existing rows by the background backfill
+    op.add_column("chat_history", sa.Column("search_vector", postgresql.TSVECTOR()))
+    op.create_index("ix_chat_history_search_vector", "chat_history", ["search_vector"], postgresql_using="gin")
+
+def downgrade():
+    op.drop_index("ix_chat_history_search_vector", table_name="chat_history")
+    op.drop_column("chat_history", "search_vector")
@@ -0,0 +1,24 @@
+"""state of the latest report job on research_sessions
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Lets any worker answer for a report job running on another one
+    op.add_column("research_sessions", sa.Column("job_id", sa.String()))
+    op.add_column("research_sessions", sa.Column("job", sa.JSON()))
+    op.create_index("ix_research_sessions_job_id", "research_sessions", ["job_id"])
+
+def downgrade():
+    op.drop_index("ix_research_sessions_job_id", table_name="research_sessions")
+    op.drop_column("research_sessions", "job")
+    op.drop_column("research_sessions", "job_id")
@@ -1,6 +1,8 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Index, Float
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 
+from app.db.compression import CompressedText
 from app.db.database import Base
 
 from datetime import datetime
@@ -16,15 +18,75 @@ class User(Base):
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
 
     chat_historiy = relationship("ChatHistory", back_populates="user")
+    research_sessions = relationship("ResearchSession", back_populates="user")
+
+class ResearchSession(Base):
+    __tablename__ = "research_sessions"
+    id = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    name = Column(String)
+    topic = Column(String)
+    status = Column(String, nullable=False, default="analysts")
+    reports = Column(Integer, nullable=False, default=0)
+    total_tokens = Column(Integer, nullable=False, default=0)
+    # Latest report job, written by the worker running it so every worker can report its progress
+    job_id = Column(String, index=True)
+    job = Column(JSON)
+    created_at = Column(DateTime, default=datetime.now, nullable=False)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+    user = relationship("User", back_populates="research_sessions")
+    chat_history = relationship("ChatHistory", back_populates="research_session")
+
+    __table_args__ = (
+        Index("ix_research_sessions_user_id_created_at", "user_id", "created_at"),
+    )
 
 class ChatHistory(Base):
     __tablename__ = "chat_history"
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), index=True)
-    session_id = Column(String, index=True)
+    session_id = Column(String, ForeignKey("research_sessions.id", name="fk_chat_history_session_id"))
     session_name = Column(String)
     message = Column(String)
-    response = Column(String)
+    response = Column(CompressedText)
+    created_at = Column(DateTime, default=datetime.now)
+    search_vector = deferred(Column(TSVECTOR))
+
+    user = relationship("User", back_populates="chat_historiy")
+    research_session = relationship("ResearchSession", back_populates="chat_history")
+
+    __table_args__ = (
+        Index("ix_chat_history_session_id_created_at", "session_id", "created_at"),
+        Index("ix_chat_history_search_vector", "search_vector", postgresql_using="gin"),
+    )
+
+class CacheEntry(Base):
+    __tablename__ = "cache_entries"
+    id = Column(Integer, primary_key=True, index=True)
+    namespace = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    value = Column(JSON)
+    created_at = Column(DateTime, default=datetime.now, index=True)
+    expires_at = Column(DateTime, index=True)
+
+    __table_args__ = (
+        Index("ix_cache_entries_namespace_key", "namespace", "key", unique=True),
+    )
+
+class LLMUsage(Base):
+    __tablename__ = "llm_usage"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    session_id = Column(String, index=True)
+    node = Column(String)
+    model = Column(String)
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+    total_tokens = Column(Integer, default=0)
+    latency_ms = Column(Float)
     created_at = Column(DateTime, default=datetime.now)
 
-    user = relationship("User", back_populates="chat_historiy")
\ No newline at end of file
+    __table_args__ = (
+        Index("ix_llm_usage_user_id_created_at", "user_id", "created_at"),
+    )
\ No newline at end of file
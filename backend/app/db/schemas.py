@@ -31,14 +31,70 @@ class ChatHistoryCreate(BaseModel):
     message: str
     response: str
 
-class SessionHistoryResponse(BaseModel):
+class SessionHistorySummary(BaseModel):
     id: int
     user_id: int 
     session_id: str
     session_name: str
     message: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class SessionHistoryResponse(SessionHistorySummary):
     response: str 
+
+class SessionSummary(BaseModel):
+    session_id: str
+    session_name: str
+    created_at: datetime
+
+class SessionListResponse(BaseModel):
+    sessions: List[SessionSummary]
+    next_cursor: Optional[str] = None
+
+class ReportSearchResult(BaseModel):
+    id: int
+    session_id: str
+    session_name: str
+    message: str
+    # HTML-escaped report text, the only markup is <mark> around the matched words
+    snippet: str
+    rank: float
+    created_at: datetime
+
+class ReportSearchResponse(BaseModel):
+    results: List[ReportSearchResult]
+    next_cursor: Optional[str] = None
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    session_id: str
+    status: str
+    current_node: Optional[str] = None
+    completed_steps: int
+    total_steps: Optional[int] = None
+    progress: float
+    report: Optional[str] = None
+    token_usage: Optional[int] = None
+    error: Optional[str] = None
+    document_stats: Optional[dict] = None
     created_at: datetime
+    finished_at: Optional[datetime] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class UsageGroupBy(str, Enum):
+    node = "node"
+    session = "session"
+    model = "model"
+
+class UsageAggregate(BaseModel):
+    key: Optional[str] = None
+    calls: int
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    avg_latency_ms: float
\ No newline at end of file
@@ -0,0 +1,113 @@
+""" Full-text search vectors of stored reports.
+
+Reports are compressed in the database, so the tsvector is computed from the plain text bound at
+insert time instead of by a trigger.
+
+    python -m app.db.search_index backfill
+"""
+
+from typing import Optional
+import argparse
+import html
+import logging
+import threading
+import time
+
+from sqlalchemy import String, cast, func, literal, literal_column, select, text, update
+from sqlalchemy.dialects.postgresql import REGCONFIG
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_LOCK_ID = 72910433
+# ts_headline marks matches with private-use characters, the rest of the snippet is escaped before they become <mark> tags
+HIGHLIGHT_START = "\ue000"
+HIGHLIGHT_STOP = "\ue001"
+HEADLINE_OPTIONS = f"MaxFragments=2, MaxWords=30, MinWords=10, StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}"
+
+def search_language():
+    return cast(literal(settings.search_language, String), REGCONFIG)
+
+def search_query(query: str):
+    """ Web-search style query: quoted phrases, OR and -excluded words """
+    return func.websearch_to_tsquery(search_language(), query)
+
+def weighted(value: Optional[str], weight: str):
+    return func.setweight(func.to_tsvector(search_language(), value or ""), literal_column(f"'{weight}'"))
+
+def search_document(session_name: Optional[str], message: Optional[str], response: Optional[str]):
+    """ Session name ranks above the topic, which ranks above the report body """
+    return weighted(session_name, "A").op("||")(weighted(message, "B")).op("||")(weighted(response, "C"))
+
+def highlighted_html(headline: str):
+    """ Escaped snippet in which only the <mark> tags around the matches are markup """
+    return html.escape(headline).replace(HIGHLIGHT_START, "<mark>").replace(HIGHLIGHT_STOP, "</mark>")
+
+def headlines(db, query: str, documents: dict[int, str]):
+    """ HTML-safe highlighted snippets of a page of results in one round trip """
+    if not documents:
+        return {}
+    rows = db.execute(
+        text("""
+            SELECT t.id, ts_headline(CAST(:language AS regconfig), t.document, websearch_to_tsquery(CAST(:language AS regconfig), :query), :options)
+            FROM unnest(CAST(:ids AS integer[]), CAST(:documents AS text[])) AS t(id, document)
+        """),
+        {
+            "language": settings.search_language,
+            "query": query,
+            "options": HEADLINE_OPTIONS,
+            "ids": list(documents.keys()),
+            "documents": [document.replace(HIGHLIGHT_START, "").replace(HIGHLIGHT_STOP, "") for document in documents.values()],
+        }
+    ).all()
+    return {row[0]: highlighted_html(row[1]) for row in rows}
+
+def index_pending_reports(batch_size: int = 200, pause_seconds: float = 0.1, stop: Optional[threading.Event] = None):
+    """ Computes the search vector of reports stored before search was added, one committed batch at a time """
+    from app.db import models
+    from app.db.database import engine
+
+    indexed = 0
+    with engine.connect() as connection:
+        # Every worker starts the backfill, one of them does the work
+        if not connection.execute(text("SELECT pg_try_advisory_lock(:lock_id)"), {"lock_id": BACKFILL_LOCK_ID}).scalar():
+            return indexed
+        try:
+            after_id = 0
+            while stop is None or not stop.is_set():
+                rows = connection.execute(
+                    select(models.ChatHistory.id, models.ChatHistory.session_name, models.ChatHistory.message, models.ChatHistory.response)
+                    .where(models.ChatHistory.id > after_id, models.ChatHistory.search_vector.is_(None))
+                    .order_by(models.ChatHistory.id)
+                    .limit(batch_size)
+                ).all()
+                if not rows:
+                    break
+                for row in rows:
+                    connection.execute(
+                        update(models.ChatHistory)
+                        .where(models.ChatHistory.id == row.id)
+                        .values(search_vector=search_document(row.session_name, row.message, row.response))
+                    )
+                connection.commit()
+
+                indexed += len(rows)
+                after_id = rows[-1].id
+                time.sleep(pause_seconds)
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": BACKFILL_LOCK_ID})
+            connection.commit()
+
+    if indexed:
+        logger.info(f"Indexed {indexed} stored reports for search.")
+    return indexed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintenance of the report search index.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    backfill = commands.add_parser("backfill", help="Compute missing search vectors.")
+    backfill.add_argument("--batch-size", type=int, default=200, help="Rows per committed batch.")
+
+    args = parser.parse_args()
+    print(f"Indexed {index_pending_reports(args.batch_size)} reports.")
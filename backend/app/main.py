@@ -1,30 +1,108 @@
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI, status
 
-from app.db.database import create_database, engine
-from app.db.models import Base
+from app.core.auth import password_hasher
+from app.core.config import settings, rate_limiter
+from app.core.lazy import LazyModule
+from app.core.telemetry import setup_logging, register_gauge, metrics_app, refresh_gauges_periodically, mark_process_dead
+from app.db.database import create_database, engine, async_engine
+from app.db.checkpointer import open_checkpointer, close_checkpointer
+from app.db.compression import compress_pending_reports
+from app.db.search_index import index_pending_reports
+from app.db.migrate import upgrade_database
 from app.api import users, ai
+from app.utils import jobs
+from app.utils.metering import usage_meter
 
+import asyncio
 import contextlib
+import logging
+import threading
+import time
+
+setup_logging(settings.log_level)
+logger = logging.getLogger(__name__)
+
+agent = LazyModule("app.utils.agent")
+
+def warm_up():
+    """ Imports the agent, which builds the OpenAI client, and compiles its graphs ahead of the first request """
+    start = time.perf_counter()
+    compile_times = agent.graphs.warm()
+    for name, seconds in compile_times.items():
+        logger.info(f"Compiled '{name}' graph in {seconds * 1000:.1f} ms")
+    logger.info(f"Agent warm-up finished in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+def backfill_reports(stop: threading.Event):
+    """ Brings reports stored by earlier versions up to date: compression first, then search vectors """
+    backfills = []
+    if settings.report_compression_backfill:
+        backfills.append(("compression", compress_pending_reports))
+    if settings.search_index_backfill:
+        backfills.append(("search index", index_pending_reports))
+
+    for name, backfill in backfills:
+        try:
+            backfill(stop=stop)
+        except Exception as e:
+            logger.warning(f"Report {name} backfill stopped: {e}")
 
 @contextlib.asynccontextmanager
 async def lifespan(app):
     """
-    Ensures the database exists before the application starts serving requests.
+    Ensures the database is set up and starts the background workers before the application starts serving requests.
     """
-    print("Application startup: Checking and creating database...")
-    try:
-        create_database()
-        Base.metadata.create_all(bind=engine)
-        print("Database setup complete.")
+    if settings.db_create_on_startup or settings.db_migrate_on_startup:
+        logger.info("Application startup: Checking and creating database...")
+        try:
+            if settings.db_create_on_startup:
+                create_database()
+            if settings.db_migrate_on_startup:
+                upgrade_database()
+            logger.info("Database setup complete.")
+
+        except Exception as e:
+            logger.critical(f"Critical error during database setup: {e}")
+            raise
 
-    except Exception as e:
-        print(f"Critical error during database setup: {e}")
-        raise
+    await open_checkpointer()
+
+    warm_up_task = None
+    if settings.startup_warm_up == "blocking":
+        warm_up()
+    elif settings.startup_warm_up == "background":
+        warm_up_task = asyncio.create_task(asyncio.to_thread(warm_up))
+
+    backfill_task = None
+    stop_backfill = threading.Event()
+    if settings.report_compression_backfill or settings.search_index_backfill:
+        backfill_task = asyncio.create_task(asyncio.to_thread(backfill_reports, stop_backfill))
+
+    await jobs.manager.start()
+    await usage_meter.start()
+
+    gauge_task = None
+    if settings.metrics_enabled:
+        gauge_task = asyncio.create_task(refresh_gauges_periodically(settings.metrics_refresh_interval_seconds))
 
     yield
 
-    print("Application shutdown: Performing cleanup (e.g., closing connections)...")
+    logger.info("Application shutdown: Performing cleanup (e.g., closing connections)...")
+    if gauge_task is not None:
+        gauge_task.cancel()
+        await asyncio.gather(gauge_task, return_exceptions=True)
+        mark_process_dead()
+    if warm_up_task is not None:
+        await asyncio.gather(warm_up_task, return_exceptions=True)
+    if backfill_task is not None:
+        stop_backfill.set()
+        await asyncio.gather(backfill_task, return_exceptions=True)
+    await jobs.manager.stop()
+    await usage_meter.stop()
+    await close_checkpointer()
+    password_hasher.stop()
+    await async_engine.dispose()
+    engine.dispose()
 
 app = FastAPI(
     title="Researcher AI",
@@ -41,12 +119,22 @@ app.add_middleware(
     allow_origins=["*"],  
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"]
 )
 
 app.include_router(users.router, prefix="/users", tags=["Users"])
 app.include_router(ai.router, prefix="/ai", tags=["AI"])
 
+if settings.metrics_enabled:
+    app.mount("/metrics", metrics_app(settings.metrics_token))
+    register_gauge("report_job_queue_depth", "Report jobs waiting for a worker.", lambda: jobs.manager.queue_depth)
+    register_gauge("openai_rate_limit_queue_depth", "LLM calls waiting for the OpenAI rate limiter.", lambda: rate_limiter.queue_depth)
+    register_gauge("db_pool_checked_out", "Connections checked out of the sync database pool.", lambda: engine.pool.checkedout())
+    register_gauge("db_async_pool_checked_out", "Connections checked out of the async database pool.", lambda: async_engine.pool.checkedout())
+    # A rate does not add up across workers, each worker keeps its own series
+    register_gauge("search_cache_hit_rate", "Hit rate of the Tavily and Wikipedia search cache.", lambda: agent.search_cache.stats["hit_rate"] if agent.loaded else 0, multiprocess_mode="liveall")
+
 @app.get("/", status_code=status.HTTP_200_OK, tags=["Health Check"])
 def health_check():
 
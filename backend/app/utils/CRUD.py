@@ -1,20 +1,55 @@
 from app.core.auth import Authorization
 from fastapi import HTTPException, status, Request
+from sqlalchemy import Float, cast, func, insert, select, tuple_
 from sqlalchemy.orm import Session
-from app.db import models, schemas
+from app.db import models, schemas, search_index
 from datetime import datetime
+import base64
+import json
 import os
 from pathlib import Path
 
+def encode_cursor(*values):
+    """ Opaque keyset pagination cursor from the sort key of the last row of a page """
+    payload = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def cursor_value(value, expected: type):
+    if expected is datetime:
+        return datetime.fromisoformat(value)
+    if expected is float and type(value) is int:
+        return float(value)
+    if type(value) is not expected:
+        raise ValueError(f"Expected {expected.__name__}, got {type(value).__name__}.")
+    return value
+
+def decode_cursor(cursor: str, *types: type):
+    """ Sort key of a cursor, checked against the types of the sort columns, datetimes parsed from ISO format """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("Unexpected cursor shape.")
+        return [cursor_value(value, expected) for value, expected in zip(values, types)]
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor."
+        )
+
 class User:
 
     @staticmethod
-    def create(db: Session, data: schemas.UserCreate):
+    def get_by_email(db: Session, email: str):
+        return db.query(models.User).filter(models.User.email == email.lower()).first()
+
+    @staticmethod
+    def create(db: Session, data: schemas.UserCreate, hashed_password: str = None):
         user_data = data.model_dump()
         user_data["email"]= user_data["email"].lower()
         user_data.pop("password")
 
-        hashed_password = Authorization.hash_password(data.password)
+        if hashed_password is None:
+            hashed_password = Authorization.hash_password(data.password)
         new_user = models.User(**user_data, password=hashed_password)
 
         db.add(new_user)
@@ -26,38 +61,250 @@ class User:
 class ChatHistory:
 
     @staticmethod
-    def create(db: Session, data: schemas.ChatHistoryCreate, current_user: models.User):
+    def create(db: Session, data: schemas.ChatHistoryCreate, user_id: int, token_usage: int = 0):
         chat_data = data.model_dump()
-        chat_data["user_id"] = current_user.id
-
-        new_chat = models.ChatHistory(**chat_data)
+        chat_data["user_id"] = user_id
 
+        # Computed from the plain text here since the stored response is compressed
+        new_chat = models.ChatHistory(**chat_data, search_vector=search_index.search_document(data.session_name, data.message, data.response))
         db.add(new_chat)
+
+        # The session row carries the name, status and totals so listing never touches chat_history
+        db.query(models.ResearchSession).filter(models.ResearchSession.id == data.session_id).update({
+            "name": data.session_name,
+            "status": "completed",
+            "reports": models.ResearchSession.reports + 1,
+            "total_tokens": models.ResearchSession.total_tokens + (token_usage or 0),
+        })
         db.commit()
         db.refresh(new_chat)
 
         return new_chat
 
     @staticmethod
-    def get_sessions(db: Session, user_id: int):
-        sessions = db.query(models.ChatHistory).filter(models.ChatHistory.user_id == user_id).all()
-        session_dict = {}
-        for session in sessions:
-            if session.session_id not in session_dict.keys():
-                session_dict[session.session_id] = {
-                    "session_name": session.session_name,
-                    "session_id": session.session_id,
-                    "created_at": session.created_at
-                }
-        sessions = sorted(session_dict.values(), key=lambda x: x["created_at"], reverse=True)
-        return sessions
-    
+    def history_query(session_id: str, user_id: int, summary: bool = False, cursor: str = None):
+        """ Owner-scoped history of a session in (created_at, id) order, without the report bodies for summaries """
+        columns = [
+            models.ChatHistory.id,
+            models.ChatHistory.user_id,
+            models.ChatHistory.session_id,
+            models.ChatHistory.session_name,
+            models.ChatHistory.message,
+            models.ChatHistory.created_at,
+        ]
+        if not summary:
+            columns.append(models.ChatHistory.response)
+
+        query = select(*columns).where(
+            models.ChatHistory.session_id == session_id,
+            models.ChatHistory.user_id == user_id
+        )
+        if cursor is not None:
+            after_created_at, after_id = decode_cursor(cursor, datetime, int)
+            query = query.where(
+                tuple_(models.ChatHistory.created_at, models.ChatHistory.id) > tuple_(after_created_at, after_id)
+            )
+        return query.order_by(models.ChatHistory.created_at, models.ChatHistory.id)
+
+    @staticmethod
+    def get_session_history(db: Session, session_id: str, user_id: int, limit: int, cursor: str = None, summary: bool = False):
+        rows = db.execute(ChatHistory.history_query(session_id, user_id, summary, cursor).limit(limit + 1)).all()
+        next_cursor = encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None
+        return rows[:limit], next_cursor
+
+    @staticmethod
+    def iter_session_history(db: Session, session_id: str, user_id: int, cursor: str = None, summary: bool = False, batch_size: int = 20):
+        """ Streams the history through a server-side cursor, holding one batch of rows in memory at a time """
+        query = ChatHistory.history_query(session_id, user_id, summary, cursor).execution_options(yield_per=batch_size)
+        yield from db.execute(query)
+
+    @staticmethod
+    def search(db: Session, user_id: int, query: str, limit: int, cursor: str = None):
+        """ Reports of the user matching a web-search style query, best match first, with highlighted snippets """
+        ts_query = search_index.search_query(query)
+        # ts_rank_cd is a float4, the cursor would round-trip it as a float8 that no longer compares equal
+        rank = cast(func.ts_rank_cd(models.ChatHistory.search_vector, ts_query), Float(53))
+        statement = select(
+            models.ChatHistory.id,
+            models.ChatHistory.session_id,
+            models.ChatHistory.session_name,
+            models.ChatHistory.message,
+            models.ChatHistory.response,
+            models.ChatHistory.created_at,
+            rank.label("rank"),
+        ).where(
+            models.ChatHistory.user_id == user_id,
+            models.ChatHistory.search_vector.op("@@")(ts_query)
+        )
+        if cursor is not None:
+            before_rank, before_id = decode_cursor(cursor, float, int)
+            statement = statement.where(tuple_(rank, models.ChatHistory.id) < tuple_(before_rank, before_id))
+
+        rows = db.execute(statement.order_by(rank.desc(), models.ChatHistory.id.desc()).limit(limit + 1)).all()
+        page = rows[:limit]
+        snippets = search_index.headlines(db, query, {row.id: row.response or "" for row in page})
+        results = [
+            {
+                "id": row.id,
+                "session_id": row.session_id,
+                "session_name": row.session_name,
+                "message": row.message,
+                "snippet": snippets.get(row.id, ""),
+                "rank": row.rank,
+                "created_at": row.created_at,
+            }
+            for row in page
+        ]
+        next_cursor = encode_cursor(rows[limit - 1].rank, rows[limit - 1].id) if len(rows) > limit else None
+        return results, next_cursor
+
+class ResearchSession:
+
+    @staticmethod
+    def get(db: Session, session_id: str):
+        return db.get(models.ResearchSession, session_id)
+
+    @staticmethod
+    def start(db: Session, session_id: str, user_id: int, topic: str):
+        """ Creates the session on its first research run, raising 404 if it belongs to another user """
+        research_session = ResearchSession.get(db, session_id)
+        if research_session is None:
+            research_session = models.ResearchSession(id=session_id, user_id=user_id)
+            db.add(research_session)
+        elif research_session.user_id != user_id:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Session not found."
+            )
+
+        research_session.topic = topic
+        research_session.status = "analysts"
+        db.commit()
+
+        return research_session
+
     @staticmethod
-    def get_session_history(db: Session, session_id: str):
-        session_history = db.query(models.ChatHistory).filter(models.ChatHistory.session_id == session_id).all()
-        if not session_history:
+    def get_owned(db: Session, session_id: str, user_id: int):
+        """ Primary key lookup of a session of the user, 404 for unknown and foreign sessions alike """
+        research_session = ResearchSession.get(db, session_id)
+        if research_session is None or research_session.user_id != user_id:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
-                detail="Session history not found."
+                detail="Session not found."
             )
-        return session_history
+        return research_session
+
+    @staticmethod
+    def save_job(db: Session, session_id: str, job_id: str, job_state: dict):
+        """ Persists a report job's state, the session status follows the job """
+        db.query(models.ResearchSession).filter(models.ResearchSession.id == session_id).update({
+            "job_id": job_id,
+            "job": job_state,
+            "status": job_state["status"],
+            "updated_at": datetime.now(),
+        })
+        db.commit()
+
+    @staticmethod
+    def touch_jobs(db: Session, session_ids: list[str]):
+        """ Heartbeat of the unfinished jobs of one worker """
+        db.query(models.ResearchSession).filter(models.ResearchSession.id.in_(session_ids)).update(
+            {"updated_at": datetime.now()}, synchronize_session=False
+        )
+        db.commit()
+
+    @staticmethod
+    def fail_stale_jobs(db: Session, stale_before: datetime, error: str):
+        """ Marks queued and running jobs that no worker has refreshed since stale_before as failed """
+        research_sessions = db.query(models.ResearchSession).filter(
+            models.ResearchSession.job_id.isnot(None),
+            models.ResearchSession.status.in_(("queued", "running")),
+            models.ResearchSession.updated_at < stale_before
+        ).with_for_update(skip_locked=True).all()
+
+        for research_session in research_sessions:
+            research_session.status = "failed"
+            research_session.job = {**research_session.job, "status": "failed", "error": error, "finished_at": datetime.now().isoformat()}
+        db.commit()
+
+        return len(research_sessions)
+
+    @staticmethod
+    def get_job(db: Session, user_id: int, job_id: str = None, session_id: str = None):
+        """ Last persisted state of a report job of the user, by job or by session for its latest job """
+        query = db.query(models.ResearchSession).filter(models.ResearchSession.user_id == user_id)
+        if job_id is not None:
+            query = query.filter(models.ResearchSession.job_id == job_id)
+        else:
+            query = query.filter(models.ResearchSession.id == session_id, models.ResearchSession.job_id.isnot(None))
+        research_session = query.first()
+        if research_session is None or research_session.job is None:
+            return None
+
+        job = dict(research_session.job)
+        if job["status"] == "completed":
+            latest_report = db.query(models.ChatHistory.response).filter(
+                models.ChatHistory.session_id == research_session.id,
+                models.ChatHistory.user_id == user_id
+            ).order_by(models.ChatHistory.created_at.desc(), models.ChatHistory.id.desc()).first()
+            job["report"] = latest_report.response if latest_report else None
+
+        total_steps = job.get("total_steps")
+        return {
+            **job,
+            "job_id": research_session.job_id,
+            "session_id": research_session.id,
+            "progress": min(job["completed_steps"] / total_steps, 1.0) if total_steps else 0.0,
+        }
+
+    @staticmethod
+    def get_sessions(db: Session, user_id: int, limit: int, cursor: str = None):
+        """ Sessions with at least one report, newest first, read through (user_id, created_at) """
+        query = db.query(
+            models.ResearchSession.id,
+            models.ResearchSession.name,
+            models.ResearchSession.created_at,
+        ).filter(models.ResearchSession.user_id == user_id, models.ResearchSession.reports > 0)
+
+        if cursor is not None:
+            before_created_at, before_session_id = decode_cursor(cursor, datetime, str)
+            query = query.filter(
+                tuple_(models.ResearchSession.created_at, models.ResearchSession.id) < tuple_(before_created_at, before_session_id)
+            )
+
+        rows = query.order_by(models.ResearchSession.created_at.desc(), models.ResearchSession.id.desc()).limit(limit + 1).all()
+        sessions = [
+            {"session_name": row.name, "session_id": row.id, "created_at": row.created_at}
+            for row in rows[:limit]
+        ]
+        next_cursor = encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None
+        return sessions, next_cursor
+
+class LLMUsage:
+
+    @staticmethod
+    def create_many(db: Session, records: list[dict]):
+        db.execute(insert(models.LLMUsage), records)
+        db.commit()
+
+    @staticmethod
+    def aggregate(db: Session, user_id: int, group_by: schemas.UsageGroupBy, session_id: str = None):
+        columns = {
+            schemas.UsageGroupBy.node: models.LLMUsage.node,
+            schemas.UsageGroupBy.session: models.LLMUsage.session_id,
+            schemas.UsageGroupBy.model: models.LLMUsage.model,
+        }
+        key = columns[group_by]
+
+        query = db.query(
+            key.label("key"),
+            func.count(models.LLMUsage.id).label("calls"),
+            func.sum(models.LLMUsage.prompt_tokens).label("prompt_tokens"),
+            func.sum(models.LLMUsage.completion_tokens).label("completion_tokens"),
+            func.sum(models.LLMUsage.total_tokens).label("total_tokens"),
+            func.avg(models.LLMUsage.latency_ms).label("avg_latency_ms"),
+        ).filter(models.LLMUsage.user_id == user_id)
+        if session_id is not None:
+            query = query.filter(models.LLMUsage.session_id == session_id)
+
+        return query.group_by(key).order_by(func.sum(models.LLMUsage.total_tokens).desc()).all()
@@ -2,7 +2,7 @@ from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, get_
 from langchain_community.document_loaders import WikipediaLoader
 from langchain_community.tools.tavily_search import TavilySearchResults
 from langchain_core.callbacks import get_usage_metadata_callback
-from langgraph.checkpoint.memory import MemorySaver
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import START, END, StateGraph
 from langgraph.graph import MessagesState
 from langgraph.constants import Send
@@ -10,13 +10,36 @@ from langgraph.constants import Send
 from typing import List, Annotated
 from typing_extensions import TypedDict
 from pydantic import BaseModel, Field
+import asyncio
+import logging
 import operator
+import threading
+import time
 
 from app.core.config import settings, llm
+from app.core.telemetry import external_call, tracing_callback
+from app.db.checkpointer import get_checkpointer
 from app.utils import prompts
+from app.utils.cache import build_cache, hash_key
+from app.utils.context import assemble_context, merge_documents
+from app.utils.documents import DocumentStore, get_document_store, release_document_store
+from app.utils.llm_cache import llm_cache
+from app.utils.metering import usage_meter
+
+logger = logging.getLogger(__name__)
 
-memory = MemorySaver()
 tavily_search = TavilySearchResults(tavily_api_key=settings.tavily_api_key, max_results=3)
+search_cache = build_cache(
+    "search",
+    settings.search_cache_backend,
+    max_entries=settings.search_cache_max_entries,
+    max_shared_entries=settings.search_cache_max_shared_entries,
+    ttl_seconds=settings.search_cache_ttl_seconds
+)
+
+def total_tokens(cb):
+    """ Tokens reported to a usage callback, zero when every call was answered from the cache """
+    return sum(usage['total_tokens'] for usage in cb.usage_metadata.values())
 
 ########### Analyst Generation Graph ###########
 
@@ -49,7 +72,7 @@ class GenerateAnalystsState(TypedDict):
     analysts: List[Analyst]
     token_usage: Annotated[list, operator.add]
 
-def create_analysts(state: GenerateAnalystsState):
+async def create_analysts(state: GenerateAnalystsState, config: RunnableConfig):
     
     """ Create analysts """
     
@@ -64,11 +87,10 @@ def create_analysts(state: GenerateAnalystsState):
                                                             human_analyst_feedback=human_analyst_feedback, 
                                                             max_analysts=max_analysts)
     with get_usage_metadata_callback() as cb:
-        analysts = structured_llm.invoke([SystemMessage(content=system_message)]+[HumanMessage(content="Generate the set of analysts.")])
-        model_info = next(iter(cb.usage_metadata.values()))
-        token_usage = model_info['total_tokens']
+        analysts = await llm_cache.ainvoke("create_analysts", structured_llm, [SystemMessage(content=system_message)]+[HumanMessage(content="Generate the set of analysts.")], config, schema=Perspectives)
+        token_usage = total_tokens(cb)
 
-    return {"analysts": analysts.analysts, "token_usage": [token_usage]}
+    return {"analysts": analysts.analysts[:max_analysts], "token_usage": [token_usage]}
 
 def human_feedback(state: GenerateAnalystsState):
     pass
@@ -89,7 +111,7 @@ def analyst_graph():
     builder.add_edge("create_analysts", "human_feedback")
     builder.add_conditional_edges("human_feedback", should_continue, ["create_analysts", END])
 
-    graph = builder.compile(interrupt_before=['human_feedback'], checkpointer=memory)
+    graph = builder.compile(interrupt_before=['human_feedback'], checkpointer=get_checkpointer())
     
     return graph
 
@@ -97,16 +119,17 @@ def analyst_graph():
 
 class InterviewState(MessagesState):
     max_num_turns: int 
-    context: Annotated[list, operator.add] 
+    context: Annotated[list, merge_documents]
     analyst: Analyst 
     interview: str 
     sections: list 
+    search_queries: list
     token_usage: Annotated[list, operator.add]
 
-class SearchQuery(BaseModel):
-    search_query: str = Field(None, description="Search query for retrieval.")
+class SearchQueries(BaseModel):
+    search_queries: List[str] = Field(description="Search queries for retrieval, most relevant first.")
 
-def generate_question(state: InterviewState):
+async def generate_question(state: InterviewState, config: RunnableConfig):
     """ Node to generate a question """
 
     # Get state
@@ -117,80 +140,107 @@ def generate_question(state: InterviewState):
     # Generate question 
     system_message = prompts.question_instructions.format(goals=analyst.persona)
     with get_usage_metadata_callback() as cb:
-        question = llm.invoke([SystemMessage(content=system_message)]+messages)
+        question = await llm_cache.ainvoke("ask_question", llm, [SystemMessage(content=system_message)]+messages, config)
 
-        model_info = next(iter(cb.usage_metadata.values()))
-        token_usage = model_info['total_tokens']
+        token_usage = total_tokens(cb)
         
     # Write messages to state
     return {"messages": [question], "token_usage": [token_usage]}
 
-search_instructions = SystemMessage(content=f"""You will be given a conversation between an analyst and an expert. 
+async def generate_query(state: InterviewState, config: RunnableConfig):
 
-Your goal is to generate a well-structured query for use in retrieval and / or web-search related to the conversation.
-        
-First, analyze the full conversation.
+    """ Generate the search queries shared by every retriever for this turn """
+
+    variants = max(settings.search_query_variants, 1)
+    instructions = prompts.search_instructions
+    if variants > 1:
+        instructions += prompts.query_variants_instructions.format(variants=variants)
+
+    structured_llm = llm.with_structured_output(SearchQueries)
+    with get_usage_metadata_callback() as cb:
+        search_queries = await llm_cache.ainvoke("generate_query", structured_llm, [SystemMessage(content=instructions)]+state['messages'], config, schema=SearchQueries)
+
+        token_usage = total_tokens(cb)
+
+    return {"search_queries": search_queries.search_queries[:variants], "token_usage": [token_usage]}
+
+async def search_all(source: str, search_queries: list, search, store: DocumentStore):
+    """ Runs every query variant against one retriever, sharing fetches across the session's interviews """
+
+    results = await asyncio.gather(*[
+        store.search(hash_key(source, normalize_query(query)), lambda query=query: cached_search(source, query, search))
+        for query in search_queries
+    ])
+    return [doc for search_docs in results if isinstance(search_docs, list) for doc in search_docs]
+
+def normalize_query(query: str):
+    return " ".join(query.lower().split())
+
+async def cached_search(source: str, query: str, search):
+    """ Returns cached results for the normalized query and source, calling the retriever on a miss """
+
+    if not settings.search_cache_enabled:
+        async with external_call(source, query=repr(query)):
+            return await search(query)
 
-Pay particular attention to the final question posed by the analyst.
+    key = hash_key(source, normalize_query(query))
+    search_docs = await search_cache.aget(key)
+    if search_docs is None:
+        async with external_call(source, query=repr(query)):
+            search_docs = await search(query)
+        # Tavily reports failures as a string, only cache real results
+        if isinstance(search_docs, list):
+            await search_cache.aset(key, search_docs)
 
-Convert this final question into a well-structured web search query""")
+    return search_docs
 
-def search_web(state: InterviewState):
+async def load_wikipedia(query: str):
+    search_docs = await WikipediaLoader(query=query, load_max_docs=2).aload()
+    return [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in search_docs]
+
+async def search_web(state: InterviewState, config: RunnableConfig):
     
     """ Retrieve docs from web search """
 
-    # Search query
-    structured_llm = llm.with_structured_output(SearchQuery)
-    search_query = structured_llm.invoke([search_instructions]+state['messages'])
-    
+    store = get_document_store(config["configurable"]["thread_id"])
+
     # Search
-    search_docs = tavily_search.invoke(search_query.search_query)
-    print(search_docs)
-     # Format
-    formatted_search_docs = "\n\n---\n\n".join(
-        [
-            f'<Document href="{doc["url"]}"/>\n{doc["content"]}\n</Document>'
-            for doc in search_docs
-        ]
-    )
+    search_docs = await search_all("tavily", state['search_queries'], tavily_search.ainvoke, store)
+    logger.debug(f"Web search returned {len(search_docs)} documents")
 
-    return {"context": [formatted_search_docs]} 
+    return {"context": [
+        store.register(doc["url"], f'<Document href="{doc["url"]}"/>\n{doc["content"]}\n</Document>', llm.model_name)
+        for doc in search_docs
+    ]}
 
-def search_wikipedia(state: InterviewState):
+async def search_wikipedia(state: InterviewState, config: RunnableConfig):
     
     """ Retrieve docs from wikipedia """
 
-    structured_llm = llm.with_structured_output(SearchQuery)
-    search_query = structured_llm.invoke([search_instructions]+state['messages'])
-    
-    search_docs = WikipediaLoader(query=search_query.search_query, 
-                                  load_max_docs=2).load()
-
-    formatted_search_docs = "\n\n---\n\n".join(
-        [
-            f'<Document source="{doc.metadata["source"]}" page="{doc.metadata.get("page", "")}"/>\n{doc.page_content}\n</Document>'
-            for doc in search_docs
-        ]
-    )
+    store = get_document_store(config["configurable"]["thread_id"])
 
-    return {"context": [formatted_search_docs]} 
+    search_docs = await search_all("wikipedia", state['search_queries'], load_wikipedia, store)
 
-def generate_answer(state: InterviewState):
+    return {"context": [
+        store.register(doc["metadata"]["source"], f'<Document source="{doc["metadata"]["source"]}" page="{doc["metadata"].get("page", "")}"/>\n{doc["page_content"]}\n</Document>', llm.model_name)
+        for doc in search_docs
+    ]}
+
+async def generate_answer(state: InterviewState, config: RunnableConfig):
     
     """ Node to answer a question """
 
     analyst = state["analyst"]
     messages = state["messages"]
-    context = state["context"]
+    context = assemble_context(state["context"], llm.model_name)
 
     system_message = prompts.answer_instructions.format(goals=analyst.persona, context=context)
 
     with get_usage_metadata_callback() as cb:
-        answer = llm.invoke([SystemMessage(content=system_message)]+messages)
+        answer = await llm_cache.ainvoke("answer_question", llm, [SystemMessage(content=system_message)]+messages, config)
 
         token_usage=state.get('token_usage', 0)
-        model_info = next(iter(cb.usage_metadata.values()))
-        token_usage = model_info['total_tokens']
+        token_usage = total_tokens(cb)
             
     answer.name = "expert"
     
@@ -227,28 +277,28 @@ def route_messages(state: InterviewState,
         return 'save_interview'
     return "ask_question"
 
-def write_section(state: InterviewState):
+async def write_section(state: InterviewState, config: RunnableConfig):
 
     """ Node to answer a question """
 
     interview = state["interview"]
-    context = state["context"]
+    context = assemble_context(state["context"], llm.model_name)
     analyst = state["analyst"]
    
     system_message = prompts.section_writer_instructions.format(focus=analyst.description)
 
     with get_usage_metadata_callback() as cb:
-        section = llm.invoke([SystemMessage(content=system_message)]+[HumanMessage(content=f"Use this source to write your section: {context}")]) 
+        section = await llm_cache.ainvoke("write_section", llm, [SystemMessage(content=system_message)]+[HumanMessage(content=f"Use this source to write your section: {context}")], config)
         
         token_usage=state.get('token_usage', 0)
-        model_info = next(iter(cb.usage_metadata.values()))
-        token_usage = model_info['total_tokens']
+        token_usage = total_tokens(cb)
                 
     return {"sections": [section.content], "token_usage": [token_usage]}
 
 def interview_graph():
     interview_builder = StateGraph(InterviewState)
     interview_builder.add_node("ask_question", generate_question)
+    interview_builder.add_node("generate_query", generate_query)
     interview_builder.add_node("search_web", search_web)
     interview_builder.add_node("search_wikipedia", search_wikipedia)
     interview_builder.add_node("answer_question", generate_answer)
@@ -256,15 +306,16 @@ def interview_graph():
     interview_builder.add_node("write_section", write_section)
 
     interview_builder.add_edge(START, "ask_question")
-    interview_builder.add_edge("ask_question", "search_web")
-    interview_builder.add_edge("ask_question", "search_wikipedia")
+    interview_builder.add_edge("ask_question", "generate_query")
+    interview_builder.add_edge("generate_query", "search_web")
+    interview_builder.add_edge("generate_query", "search_wikipedia")
     interview_builder.add_edge("search_web", "answer_question")
     interview_builder.add_edge("search_wikipedia", "answer_question")
     interview_builder.add_conditional_edges("answer_question", route_messages,['ask_question','save_interview'])
     interview_builder.add_edge("save_interview", "write_section")
     interview_builder.add_edge("write_section", END)
 
-    interview_graph = interview_builder.compile(checkpointer=memory).with_config(run_name="Conduct Interviews")
+    interview_graph = interview_builder.compile(checkpointer=get_checkpointer()).with_config(run_name="Conduct Interviews")
 
     return interview_graph
 
@@ -277,6 +328,8 @@ class ResearchGraphState(TypedDict):
     human_analyst_feedback: str 
     analysts: List[Analyst] 
     sections: Annotated[list, operator.add] 
+    section_summaries: list
+    digest: str
     introduction: str 
     content: str 
     conclusion: str 
@@ -293,66 +346,107 @@ def initiate_all_interviews(state: ResearchGraphState):
     else:
         topic = state["topic"]
         return [Send("conduct_interview", {"analyst": analyst,
+                                           "max_num_turns": settings.max_num_turns,
                                            "messages": [HumanMessage(
                                                content=f"So you said you were writing an article on {topic}?"
                                            )
                                                        ]}) for analyst in state["analysts"]]
     
-def generate_session_name(state: ResearchGraphState):
+interview_slots = asyncio.Semaphore(settings.max_concurrent_interviews)
+
+async def conduct_interview(state: dict, config: RunnableConfig):
+    """ Runs one interview subgraph, queuing behind the process-wide interview limit """
+
+    async with interview_slots:
+        interview = await graphs.get("interview").ainvoke(state, config)
+
+    return {"sections": interview["sections"], "token_usage": interview.get("token_usage", [])}
+
+async def generate_session_name(state: ResearchGraphState, config: RunnableConfig):
     """ Generate a session name for the research graph """
     
-    print("Generating session name...")
+    logger.info("Generating session name...")
     topic = state["topic"]
     session_name = state.get("session_name", None)
     if session_name is None:
         system_message = prompts.session_name_instructions
-        session_name = llm.invoke([SystemMessage(content=system_message)]+[HumanMessage(content="Generate a session name about this topic: " + topic)])
-        print(f"Generated session name: {session_name.content}")
+        with get_usage_metadata_callback() as cb:
+            session_name = await llm_cache.ainvoke("generate_session_name", llm, [SystemMessage(content=system_message)]+[HumanMessage(content="Generate a session name about this topic: " + topic)], config)
+            token_usage = total_tokens(cb)
+        logger.info(f"Generated session name: {session_name.content}")
     
-        return {"session_name": session_name.content}
+        return {"session_name": session_name.content, "token_usage": [token_usage]}
     
-def write_report(state: ResearchGraphState):
+async def summarize_batch(topic: str, sections: list, instructions: str, config: RunnableConfig):
+    system_message = instructions.format(topic=topic, context="\n\n".join(sections))
+    summary = await llm_cache.ainvoke("summarize_sections", llm, [SystemMessage(content=system_message)]+[HumanMessage(content="Write the memo.")], config)
+    return summary.content
+
+async def summarize_sections(state: ResearchGraphState, config: RunnableConfig):
+    """ Hierarchical reduce: merges the sections in batches until few enough remain, then digests them for the intro and conclusion """
+
     sections = state["sections"]
     topic = state["topic"]
+    batch_size = max(settings.report_reduce_batch_size, 2)
+
+    if settings.report_reduce_mode != "hierarchical" or len(sections) <= batch_size:
+        return {"section_summaries": sections, "digest": "\n\n".join(sections)}
+
+    with get_usage_metadata_callback() as cb:
+        summaries = sections
+        while len(summaries) > batch_size:
+            batches = [summaries[i:i + batch_size] for i in range(0, len(summaries), batch_size)]
+            # A trailing batch of one memo has nothing to merge and moves up a level as is
+            summaries = [batch[0] for batch in batches]
+            merged = [index for index, batch in enumerate(batches) if len(batch) > 1]
+            merged_summaries = await asyncio.gather(*[
+                summarize_batch(topic, batches[index], prompts.section_batch_summary_instructions, config) for index in merged
+            ])
+            for index, summary in zip(merged, merged_summaries):
+                summaries[index] = summary
+
+        digest = await summarize_batch(topic, summaries, prompts.report_digest_instructions, config)
+        token_usage = total_tokens(cb)
+
+    return {"section_summaries": summaries, "digest": digest, "token_usage": [token_usage]}
+
+async def write_report(state: ResearchGraphState, config: RunnableConfig):
+    sections = state["section_summaries"]
+    topic = state["topic"]
 
     formatted_str_sections = "\n\n".join([f"{section}" for section in sections])
     
     system_message = prompts.report_writer_instructions.format(topic=topic, context=formatted_str_sections)    
     with get_usage_metadata_callback() as cb:
-        report = llm.invoke([SystemMessage(content=system_message)]+[HumanMessage(content=f"Write a report based upon these memos.")]) 
+        report = await llm_cache.ainvoke("write_report", llm, [SystemMessage(content=system_message)]+[HumanMessage(content=f"Write a report based upon these memos.")], config)
         token_usage=state.get('token_usage', 0)
-        model_info = next(iter(cb.usage_metadata.values()))
-        token_usage = model_info['total_tokens']
+        token_usage = total_tokens(cb)
     return {"content": report.content, "token_usage": [token_usage]}
 
-def write_introduction(state: ResearchGraphState):
-    sections = state["sections"]
+async def write_introduction(state: ResearchGraphState, config: RunnableConfig):
     topic = state["topic"]
 
-    formatted_str_sections = "\n\n".join([f"{section}" for section in sections])
+    formatted_str_sections = state["digest"]
     
     
     instructions = prompts.intro_conclusion_instructions.format(topic=topic, formatted_str_sections=formatted_str_sections)    
     with get_usage_metadata_callback() as cb:
-        intro = llm.invoke([instructions]+[HumanMessage(content=f"Write the report introduction")]) 
+        intro = await llm_cache.ainvoke("write_introduction", llm, [instructions]+[HumanMessage(content=f"Write the report introduction")], config)
         token_usage=state.get('token_usage', 0)
-        model_info = next(iter(cb.usage_metadata.values()))
-        token_usage = model_info['total_tokens']
+        token_usage = total_tokens(cb)
     return {"introduction": intro.content, "token_usage": [token_usage]}
 
-def write_conclusion(state: ResearchGraphState):
-    sections = state["sections"]
+async def write_conclusion(state: ResearchGraphState, config: RunnableConfig):
     topic = state["topic"]
 
-    formatted_str_sections = "\n\n".join([f"{section}" for section in sections])
+    formatted_str_sections = state["digest"]
     
     
     instructions = prompts.intro_conclusion_instructions.format(topic=topic, formatted_str_sections=formatted_str_sections)    
     with get_usage_metadata_callback() as cb:
-        conclusion = llm.invoke([instructions]+[HumanMessage(content=f"Write the report conclusion")]) 
+        conclusion = await llm_cache.ainvoke("write_conclusion", llm, [instructions]+[HumanMessage(content=f"Write the report conclusion")], config)
         token_usage=state.get('token_usage', 0)
-        model_info = next(iter(cb.usage_metadata.values()))
-        token_usage = model_info['total_tokens']
+        token_usage = total_tokens(cb)
     return {"conclusion": conclusion.content, "token_usage": [token_usage]}
 
 def finalize_report(state: ResearchGraphState):
@@ -378,7 +472,8 @@ def research_graph():
     builder.add_node("create_analysts", create_analysts)
     builder.add_node("human_feedback", human_feedback)
     builder.add_node("generate_session_name", generate_session_name)
-    builder.add_node("conduct_interview", interview_graph())
+    builder.add_node("conduct_interview", conduct_interview)
+    builder.add_node("summarize_sections", summarize_sections)
     builder.add_node("write_report",write_report)
     builder.add_node("write_introduction",write_introduction)
     builder.add_node("write_conclusion",write_conclusion)
@@ -388,25 +483,68 @@ def research_graph():
     builder.add_edge("create_analysts", "generate_session_name")
     builder.add_edge("generate_session_name", "human_feedback")
     builder.add_conditional_edges("human_feedback", initiate_all_interviews, ["create_analysts", "conduct_interview"])
-    builder.add_edge("conduct_interview", "write_report")
-    builder.add_edge("conduct_interview", "write_introduction")
-    builder.add_edge("conduct_interview", "write_conclusion")
+    builder.add_edge("conduct_interview", "summarize_sections")
+    builder.add_edge("summarize_sections", "write_report")
+    builder.add_edge("summarize_sections", "write_introduction")
+    builder.add_edge("summarize_sections", "write_conclusion")
     builder.add_edge(["write_conclusion", "write_report", "write_introduction"], "finalize_report")
     builder.add_edge("finalize_report", END)
 
-    graph = builder.compile(interrupt_before=['human_feedback'], checkpointer=memory)
+    graph = builder.compile(interrupt_before=['human_feedback'], checkpointer=get_checkpointer())
 
     return graph
 
+########### Graph Registry ###########
+
+class GraphRegistry:
+    """ Compiles each graph once per process and hands out the compiled instance """
+
+    def __init__(self, builders: dict):
+        self.builders = builders
+        self.compiled = {}
+        self.compile_times = {}
+        # warm() may run in a background thread while the first requests arrive
+        self.lock = threading.Lock()
+
+    def get(self, name: str):
+        graph = self.compiled.get(name)
+        if graph is None:
+            with self.lock:
+                graph = self.compiled.get(name)
+                if graph is None:
+                    start = time.perf_counter()
+                    graph = self.builders[name]()
+                    self.compile_times[name] = time.perf_counter() - start
+                    self.compiled[name] = graph
+        return graph
+
+    def warm(self):
+        for name in self.builders:
+            self.get(name)
+        return self.compile_times
+
+graphs = GraphRegistry({
+    "analyst": analyst_graph,
+    "interview": interview_graph,
+    "research": research_graph,
+})
+
 ############ Analyst Generation API ###########
 
-def generate_analyst(analyst_number: int, topic: str, session_id: str):
-    graph = research_graph()
+def thread_config(session_id: str, user_id: int = None, **config):
+    """ Run config for a research session, every LLM call and node in the run is metered and traced against the user and session """
+    configurable = {"thread_id": session_id}
+    if user_id is not None:
+        configurable["user_id"] = user_id
+    return {"configurable": configurable, "callbacks": [usage_meter, tracing_callback], **config}
+
+async def generate_analyst(analyst_number: int, topic: str, session_id: str, user_id: int = None):
+    graph = graphs.get("research")
     max_analysts = analyst_number
     topic = topic
-    thread = {"configurable": {"thread_id": session_id}}
+    thread = thread_config(session_id, user_id)
 
-    for event in graph.stream({"topic":topic,"max_analysts":max_analysts,}, thread, stream_mode="values"):
+    async for event in graph.astream({"topic":topic,"max_analysts":max_analysts,}, thread, stream_mode="values", checkpoint_during=settings.checkpoint_during):
         analysts = event.get('analysts', '')
         resault = []
         if analysts:
@@ -418,14 +556,14 @@ def generate_analyst(analyst_number: int, topic: str, session_id: str):
                 resault.append("-" * 50)
     return resault
 
-def analyst_human_feedback(feedback: str, session_id: str):
-    graph = research_graph()
-    thread = {"configurable": {"thread_id": session_id}}
+async def analyst_human_feedback(feedback: str, session_id: str, user_id: int = None):
+    graph = graphs.get("research")
+    thread = thread_config(session_id, user_id)
 
     if feedback != "approve":
-        graph.update_state(thread, {"human_analyst_feedback": 
+        await graph.aupdate_state(thread, {"human_analyst_feedback": 
                                 feedback}, as_node="human_feedback")
-        for event in graph.stream(None, thread, stream_mode="values"):
+        async for event in graph.astream(None, thread, stream_mode="values", checkpoint_during=settings.checkpoint_during):
             analysts = event.get('analysts', '')
             resault = []
             if analysts:
@@ -439,18 +577,82 @@ def analyst_human_feedback(feedback: str, session_id: str):
         return resault
     
     if feedback == "approve":
-        graph.update_state(thread, {"human_analyst_feedback": 
-                            None}, as_node="human_feedback")
-        for event in graph.stream(None, thread, stream_mode="updates"):
-            print("--Node--")
-            node_name = next(iter(event.keys()))
-            print(node_name)
-
-        final_state = graph.get_state(thread)
-        report = final_state.values.get('final_report')
-        topic = final_state.values.get('topic')
-        session_name = final_state.values.get('session_name')
-        token_usage = final_state.values.get('token_usage')
-        total_usage = sum(int(value) for value in token_usage.values()) if isinstance(token_usage, dict) else sum(token_usage)
-        
-        return report, topic, session_name, total_usage
\ No newline at end of file
+        await approve_analysts(session_id)
+        async for event in stream_report(session_id, user_id):
+            if event["event"] == "progress":
+                logger.debug(f"Finished node {event['node']}")
+
+        return await get_report(session_id)
+
+async def approve_analysts(session_id: str):
+    graph = graphs.get("research")
+    thread = {"configurable": {"thread_id": session_id}}
+
+    await graph.aupdate_state(thread, {"human_analyst_feedback": 
+                        None}, as_node="human_feedback")
+
+REPORT_WRITER_NODES = ("write_report", "write_introduction", "write_conclusion")
+
+async def stream_report(session_id: str, user_id: int = None):
+    """ Runs the approved research graph and yields progress, interview and report token events """
+
+    graph = graphs.get("research")
+    # max_concurrency bounds how many interviews of this session run at once, the rest wait their turn
+    thread = thread_config(session_id, user_id, max_concurrency=settings.max_concurrent_interviews_per_session)
+
+    state = await graph.aget_state(thread)
+    # One update per interview plus summarize_sections, write_report, write_introduction, write_conclusion and finalize_report
+    total = len(state.values.get("analysts", [])) + 5
+    completed = 0
+    interviews = {}
+
+    try:
+        async for mode, chunk in graph.astream(None, thread, stream_mode=["updates", "debug", "messages"], checkpoint_during=settings.checkpoint_during):
+            if mode == "updates":
+                node_name = next(iter(chunk.keys()))
+                completed += 1
+                yield {"event": "progress", "node": node_name, "completed": completed, "total": total}
+
+            elif mode == "debug":
+                payload = chunk["payload"]
+                if payload.get("name") != "conduct_interview":
+                    continue
+
+                if chunk["type"] == "task":
+                    analyst = payload["input"]["analyst"]
+                    interviews[payload["id"]] = analyst.name
+                    yield {"event": "interview_started", "analyst": analyst.name}
+
+                elif chunk["type"] == "task_result" and not payload.get("error"):
+                    analyst_name = interviews.get(payload["id"])
+                    yield {"event": "interview_finished", "analyst": analyst_name}
+                    result = payload["result"]
+                    for channel, value in (result.items() if isinstance(result, dict) else result):
+                        if channel == "sections":
+                            for section in value:
+                                yield {"event": "section_written", "analyst": analyst_name, "section": section}
+
+            elif mode == "messages":
+                message, metadata = chunk
+                node_name = metadata.get("langgraph_node")
+                if node_name in REPORT_WRITER_NODES and message.content:
+                    yield {"event": "token", "node": node_name, "content": message.content}
+    finally:
+        # A failed or abandoned stream would otherwise keep the session's documents for the life of the process
+        document_stats = release_document_store(session_id)
+
+    logger.info(f"Session {session_id} documents: {document_stats}")
+    yield {"event": "documents", **document_stats}
+
+async def get_report(session_id: str):
+    graph = graphs.get("research")
+    thread = {"configurable": {"thread_id": session_id}}
+
+    final_state = await graph.aget_state(thread)
+    report = final_state.values.get('final_report')
+    topic = final_state.values.get('topic')
+    session_name = final_state.values.get('session_name')
+    token_usage = final_state.values.get('token_usage')
+    total_usage = sum(int(value) for value in token_usage.values()) if isinstance(token_usage, dict) else sum(token_usage)
+    
+    return report, topic, session_name, total_usage
@@ -0,0 +1,224 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Optional
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+import xxhash
+from sqlalchemy.dialects.postgresql import insert
+
+from app.db import models
+from app.db.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+def hash_key(*parts: str):
+    """ Content address for a cache entry """
+    return xxhash.xxh3_128_hexdigest("\x1f".join(parts))
+
+class MemoryCache:
+    """ In-process LRU tier with per-entry TTL """
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+class PostgresCache:
+    """ Shared tier stored in the cache_entries table, bounded by TTL and row count """
+
+    def __init__(self, namespace: str, max_entries: int, ttl_seconds: int, evict_every: int = 100):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.evict_every = evict_every
+        self.writes = 0
+
+    def get(self, key: str):
+        db = SessionLocal()
+        try:
+            entry = db.query(models.CacheEntry.value).filter(
+                models.CacheEntry.namespace == self.namespace,
+                models.CacheEntry.key == key,
+                models.CacheEntry.expires_at > datetime.now()
+            ).first()
+            return entry.value if entry else None
+        finally:
+            db.close()
+
+    def set(self, key: str, value: Any):
+        now = datetime.now()
+        expires_at = now + timedelta(seconds=self.ttl_seconds)
+        query = insert(models.CacheEntry).values(
+            namespace=self.namespace, key=key, value=value, created_at=now, expires_at=expires_at
+        ).on_conflict_do_update(
+            index_elements=[models.CacheEntry.namespace, models.CacheEntry.key],
+            set_={"value": value, "created_at": now, "expires_at": expires_at}
+        )
+
+        db = SessionLocal()
+        try:
+            db.execute(query)
+            self.writes += 1
+            if self.writes % self.evict_every == 0:
+                self.evict(db)
+            db.commit()
+        finally:
+            db.close()
+
+    def evict(self, db):
+        """ Drops expired rows, then the oldest rows beyond max_entries """
+        entries = db.query(models.CacheEntry).filter(models.CacheEntry.namespace == self.namespace)
+        entries.filter(models.CacheEntry.expires_at <= datetime.now()).delete(synchronize_session=False)
+
+        cutoff = entries.with_entities(models.CacheEntry.created_at).order_by(
+            models.CacheEntry.created_at.desc()
+        ).offset(self.max_entries).limit(1).scalar()
+        if cutoff is not None:
+            entries.filter(models.CacheEntry.created_at <= cutoff).delete(synchronize_session=False)
+
+class SQLiteCache:
+    """ Shared tier in a local SQLite file, bounded by TTL and row count """
+
+    def __init__(self, namespace: str, path: str, max_entries: int, ttl_seconds: int, evict_every: int = 100):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.evict_every = evict_every
+        self.writes = 0
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT, created_at REAL, expires_at REAL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        self.connection.commit()
+
+    def get(self, key: str):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT value FROM cache_entries WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (self.namespace, key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any):
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), now, now + self.ttl_seconds)
+            )
+            self.writes += 1
+            if self.writes % self.evict_every == 0:
+                self.evict()
+            self.connection.commit()
+
+    def evict(self):
+        """ Drops expired rows, then the oldest rows beyond max_entries """
+        self.connection.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?", (self.namespace, time.time())
+        )
+        self.connection.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND key NOT IN "
+            "(SELECT key FROM cache_entries WHERE namespace = ? ORDER BY created_at DESC LIMIT ?)",
+            (self.namespace, self.namespace, self.max_entries)
+        )
+
+class TieredCache:
+    """ Memory LRU in front of an optional shared tier, with hit-rate counters """
+
+    def __init__(self, memory: MemoryCache, shared: Optional[PostgresCache | SQLiteCache] = None):
+        self.memory = memory
+        self.shared = shared
+        self.memory_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    async def aget(self, key: str):
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+
+        if self.shared is not None:
+            try:
+                value = await asyncio.to_thread(self.shared.get, key)
+            except Exception as e:
+                logger.warning(f"Shared cache lookup failed: {e}")
+                value = None
+            if value is not None:
+                self.shared_hits += 1
+                self.memory.set(key, value)
+                return value
+
+        self.misses += 1
+        return None
+
+    async def aset(self, key: str, value: Any):
+        self.memory.set(key, value)
+        if self.shared is not None:
+            try:
+                await asyncio.to_thread(self.shared.set, key, value)
+            except Exception as e:
+                logger.warning(f"Shared cache write failed: {e}")
+
+    @property
+    def stats(self):
+        lookups = self.memory_hits + self.shared_hits + self.misses
+        hits = self.memory_hits + self.shared_hits
+        return {
+            "memory_hits": self.memory_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+def build_cache(namespace: str, backend: str, max_entries: int, max_shared_entries: int, ttl_seconds: int, sqlite_path: Optional[str] = None):
+    """ Builds a tiered cache for the backend selected in settings ("memory", "sqlite" or "postgres") """
+    backend = backend.lower()
+    memory = MemoryCache(max_entries, ttl_seconds)
+
+    if backend == "memory":
+        return TieredCache(memory)
+    if backend == "postgres":
+        return TieredCache(memory, PostgresCache(namespace, max_shared_entries, ttl_seconds))
+    if backend == "sqlite":
+        return TieredCache(memory, SQLiteCache(namespace, sqlite_path, max_shared_entries, ttl_seconds))
+
+    raise ValueError(f"Unknown cache backend '{backend}'.")
@@ -0,0 +1,57 @@
+from functools import lru_cache
+
+import tiktoken
+
+from app.core.config import settings
+
+DOCUMENT_SEPARATOR = "\n\n---\n\n"
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+@lru_cache(maxsize=4096)
+def count_tokens(content: str, model: str):
+    return len(get_encoding(model).encode(content))
+
+def token_budget(model: str):
+    return settings.context_token_budgets.get(model, settings.context_token_budget)
+
+def merge_documents(documents: list, new_documents: list):
+    """ State reducer that keeps one entry per source, moving re-retrieved documents to the latest turn """
+    new_sources = {document["source"] for document in new_documents}
+    return [document for document in documents if document["source"] not in new_sources] + new_documents
+
+def assemble_context(documents: list, model: str):
+    """ Deduplicates documents by source and keeps the newest ones that fit in the model's token budget """
+
+    budget = token_budget(model)
+    seen = set()
+    selected = []
+    used = 0
+
+    # The latest turn's documents answer the current question, so they are kept first
+    for document in reversed(documents):
+        if document["source"] in seen:
+            continue
+        seen.add(document["source"])
+
+        content = document["content"]
+        tokens = document.get("tokens") or count_tokens(content, model)
+        remaining = budget - used
+        if tokens > remaining:
+            if remaining < settings.context_min_document_tokens:
+                continue
+            encoding = get_encoding(model)
+            content = encoding.decode(encoding.encode(content)[:remaining])
+            tokens = remaining
+
+        selected.append(content)
+        used += tokens
+        if used >= budget:
+            break
+
+    return DOCUMENT_SEPARATOR.join(reversed(selected))
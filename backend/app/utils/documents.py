@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+from app.utils.cache import hash_key
+from app.utils.context import count_tokens
+
+class DocumentStore:
+    """ Session-scoped store of retrieved documents shared by the parallel interviews """
+
+    def __init__(self):
+        self.documents = {}
+        self.searches = {}
+        self.registered = 0
+        self.last_used = time.monotonic()
+
+    async def search(self, key: str, fetch):
+        """ Runs each distinct search once per session, concurrent interviews await the same fetch """
+        self.last_used = time.monotonic()
+
+        task = self.searches.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            self.searches[key] = task
+
+        try:
+            # Shielded so one interview being cancelled does not cancel the fetch for the others
+            return await asyncio.shield(task)
+        except Exception:
+            self.searches.pop(key, None)
+            raise
+
+    def register(self, source: str, content: str, model: str):
+        """ Returns the session's copy of a document, keyed by its URL or source, or its content hash """
+        key = hash_key(source) if source else hash_key(content)
+        self.registered += 1
+
+        document = self.documents.get(key)
+        if document is None:
+            document = {"source": source or key, "content": content, "tokens": count_tokens(content, model)}
+            self.documents[key] = document
+        return document
+
+    @property
+    def stats(self):
+        unique = len(self.documents)
+        return {
+            "documents_registered": self.registered,
+            "documents_unique": unique,
+            "dedup_ratio": 1 - unique / self.registered if self.registered else 0.0,
+        }
+
+stores: dict[str, DocumentStore] = {}
+
+def get_document_store(session_id: str, max_idle_seconds: int = 3600):
+    idle_before = time.monotonic() - max_idle_seconds
+    for stale_id in [key for key, store in stores.items() if store.last_used < idle_before]:
+        del stores[stale_id]
+
+    store = stores.get(session_id)
+    if store is None:
+        store = stores[session_id] = DocumentStore()
+    return store
+
+def release_document_store(session_id: str):
+    """ Drops the session's store and returns its dedup statistics """
+    store = stores.pop(session_id, None)
+    return store.stats if store else DocumentStore().stats
@@ -0,0 +1,228 @@
+from datetime import datetime, timedelta
+from typing import Optional
+import asyncio
+import logging
+import uuid
+
+from app.core.config import settings
+from app.core.lazy import LazyModule
+from app.db import schemas
+from app.db.database import run_in_session
+from app.utils import CRUD
+
+agent = LazyModule("app.utils.agent")
+
+logger = logging.getLogger(__name__)
+
+INTERRUPTED = "Interrupted by shutdown."
+ORPHANED = "Interrupted, the worker running it stopped."
+# Heartbeats a job row may miss before it counts as orphaned
+STALE_HEARTBEATS = 3
+
+class Job:
+
+    def __init__(self, user_id: int, session_id: str):
+        self.job_id = str(uuid.uuid4())
+        self.user_id = user_id
+        self.session_id = session_id
+        self.status = "queued"
+        self.current_node: Optional[str] = None
+        self.completed_steps = 0
+        self.total_steps: Optional[int] = None
+        self.report: Optional[str] = None
+        self.token_usage: Optional[int] = None
+        self.error: Optional[str] = None
+        self.document_stats: Optional[dict] = None
+        self.created_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self.subscribers: list[asyncio.Queue] = []
+
+    @property
+    def progress(self):
+        if not self.total_steps:
+            return 0.0
+        return min(self.completed_steps / self.total_steps, 1.0)
+
+    @property
+    def done(self):
+        return self.status in ("completed", "failed")
+
+    def subscribe(self):
+        queue = asyncio.Queue()
+        self.subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        if queue in self.subscribers:
+            self.subscribers.remove(queue)
+
+    def publish(self, event: dict):
+        for queue in self.subscribers:
+            queue.put_nowait(event)
+
+    def set_status(self, status: str, **fields):
+        self.status = status
+        if self.done:
+            self.finished_at = datetime.now()
+        self.publish({"event": status, "status": status, **fields})
+
+    def state(self):
+        """ JSON state stored on the session, the report itself is read back from chat_history """
+        return {
+            "status": self.status,
+            "current_node": self.current_node,
+            "completed_steps": self.completed_steps,
+            "total_steps": self.total_steps,
+            "token_usage": self.token_usage,
+            "error": self.error,
+            "document_stats": self.document_stats,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+class JobManager:
+    """ Bounded in-process worker pool that runs approved research reports in the background.
+
+    Jobs run on the uvicorn worker that accepted them, their state is also written to the session row
+    so requests landing on another worker can follow them. The worker refreshes the rows of its
+    unfinished jobs every heartbeat, rows that stop being refreshed belong to a worker that died.
+    """
+
+    def __init__(self, workers: int, queue_size: int, retention_seconds: int, heartbeat_seconds: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.retention = timedelta(seconds=retention_seconds)
+        self.heartbeat_seconds = heartbeat_seconds
+        self.jobs: dict[str, Job] = {}
+        self.queue: Optional[asyncio.Queue] = None
+        self.tasks: list[asyncio.Task] = []
+        self.heartbeat: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self.heartbeat = asyncio.create_task(self._heartbeat())
+
+    async def stop(self):
+        tasks = self.tasks + ([self.heartbeat] if self.heartbeat is not None else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.tasks = []
+        self.heartbeat = None
+
+        # Jobs that never started would otherwise stay queued in their session rows
+        while not self.queue.empty():
+            await fail_job(self.queue.get_nowait(), INTERRUPTED)
+
+    async def submit(self, user_id: int, session_id: str):
+        """ Enqueues a report job, or returns the job already running for this session """
+        self._prune()
+
+        for job in self.jobs.values():
+            if job.session_id == session_id and not job.done:
+                return job
+
+        if self.queue.full():
+            raise asyncio.QueueFull
+
+        job = Job(user_id, session_id)
+        self.jobs[job.job_id] = job
+        # Stored before the job can start, so the queued state never overwrites a later one
+        await save_job(job)
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            del self.jobs[job.job_id]
+            raise
+        return job
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    @property
+    def queue_depth(self):
+        return self.queue.qsize() if self.queue is not None else 0
+
+    def _prune(self):
+        expire_before = datetime.now() - self.retention
+        for job_id, job in list(self.jobs.items()):
+            if job.done and job.finished_at < expire_before:
+                del self.jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                await run_report_job(job)
+            except asyncio.CancelledError:
+                await fail_job(job, INTERRUPTED)
+                raise
+            except Exception as e:
+                await fail_job(job, str(e))
+            finally:
+                self.queue.task_done()
+
+    async def _heartbeat(self):
+        """ Keeps the rows of this worker's unfinished jobs fresh and fails the ones no live worker refreshes """
+        while True:
+            stale_before = datetime.now() - timedelta(seconds=self.heartbeat_seconds * STALE_HEARTBEATS)
+            try:
+                session_ids = [job.session_id for job in self.jobs.values() if not job.done]
+                if session_ids:
+                    await run_in_session(CRUD.ResearchSession.touch_jobs, session_ids)
+                failed = await run_in_session(CRUD.ResearchSession.fail_stale_jobs, stale_before, ORPHANED)
+                if failed:
+                    logger.warning(f"Marked {failed} report jobs of stopped workers as failed.")
+            except Exception as e:
+                logger.warning(f"Failed to refresh report job heartbeats: {e}")
+            await asyncio.sleep(self.heartbeat_seconds)
+
+async def run_report_job(job: Job):
+    job.set_status("running")
+    await save_job(job)
+
+    await agent.approve_analysts(job.session_id)
+    async for event in agent.stream_report(job.session_id, job.user_id):
+        if event["event"] == "progress":
+            job.current_node = event["node"]
+            job.completed_steps = event["completed"]
+            job.total_steps = event["total"]
+        elif event["event"] == "documents":
+            job.document_stats = {key: value for key, value in event.items() if key != "event"}
+        job.publish(event)
+        if event["event"] in ("progress", "documents"):
+            await save_job(job)
+
+    report, topic, session_name, token_usage = await agent.get_report(job.session_id)
+
+    chat_data = schemas.ChatHistoryCreate(
+        session_id=job.session_id,
+        session_name=session_name,
+        message=topic,
+        response=report
+    )
+    await run_in_session(CRUD.ChatHistory.create, chat_data, job.user_id, token_usage)
+
+    job.report = report
+    job.token_usage = token_usage
+    job.set_status("completed", report=report, token_usage=token_usage)
+    await save_job(job)
+
+async def fail_job(job: Job, error: str):
+    job.error = error
+    job.set_status("failed", error=job.error)
+    await save_job(job)
+
+async def save_job(job: Job):
+    try:
+        await run_in_session(CRUD.ResearchSession.save_job, job.session_id, job.job_id, job.state())
+    except Exception as e:
+        logger.warning(f"Failed to store job {job.job_id} of session {job.session_id} as {job.status}: {e}")
+
+manager = JobManager(
+    workers=settings.report_workers,
+    queue_size=settings.report_queue_size,
+    retention_seconds=settings.report_job_retention_seconds,
+    heartbeat_seconds=settings.report_job_heartbeat_seconds
+)
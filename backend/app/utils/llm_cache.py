@@ -0,0 +1,52 @@
+from langchain_core.messages import convert_to_messages, message_to_dict, messages_from_dict, messages_to_dict
+from langchain_core.runnables import RunnableConfig
+from typing import Optional
+import json
+
+from app.core.config import settings, llm
+from app.utils.cache import build_cache, hash_key
+
+class LLMCache:
+    """ Content-addressed cache of LLM responses for the nodes enabled in settings """
+
+    def __init__(self, cache, nodes: set):
+        self.cache = cache
+        self.nodes = nodes
+
+    def enabled_for(self, node: str):
+        return node in self.nodes
+
+    @staticmethod
+    def key(messages: list, schema: Optional[type] = None):
+        """ Hash of the model, its sampling parameters, the messages and the structured-output schema """
+        serialized_messages = json.dumps(messages_to_dict(convert_to_messages(messages)), sort_keys=True, default=str)
+        serialized_schema = json.dumps(schema.model_json_schema(), sort_keys=True) if schema else ""
+        return hash_key(llm.model_name, str(llm.temperature), serialized_messages, serialized_schema)
+
+    async def ainvoke(self, node: str, runnable, messages: list, config: Optional[RunnableConfig] = None, schema: Optional[type] = None):
+        """ Invokes the runnable with the node's config, answering from the cache when the node has caching enabled """
+
+        # The config carries the callbacks, metadata and tags of the run, before Python 3.11 nothing else passes them on
+        if not self.enabled_for(node):
+            return await runnable.ainvoke(messages, config)
+
+        key = self.key(messages, schema)
+        cached = await self.cache.aget(key)
+        if cached is not None:
+            return schema.model_validate(cached) if schema else messages_from_dict([cached])[0]
+
+        response = await runnable.ainvoke(messages, config)
+        await self.cache.aset(key, response.model_dump() if schema else message_to_dict(response))
+        return response
+
+llm_cache = LLMCache(
+    build_cache(
+        "llm",
+        settings.llm_cache_backend,
+        max_entries=settings.llm_cache_max_entries,
+        max_shared_entries=settings.llm_cache_max_shared_entries,
+        ttl_seconds=settings.llm_cache_ttl_seconds,
+        sqlite_path=settings.llm_cache_sqlite_path
+    ),
+    nodes={node.strip() for node in settings.llm_cache_nodes.split(",") if node.strip()}
+)
@@ -0,0 +1,115 @@
+from datetime import datetime
+from typing import Any, Optional
+from uuid import UUID
+import asyncio
+import logging
+import time
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import LLMResult
+
+from app.core.config import settings
+from app.db.database import run_in_session
+from app.utils import CRUD
+
+logger = logging.getLogger(__name__)
+
+class UsageMeter(AsyncCallbackHandler):
+    """ Records tokens, model and latency of every LLM call, tagged with the user, session and graph node """
+
+    def __init__(self, batch_size: int, flush_interval_seconds: float):
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.runs: dict[UUID, dict] = {}
+        self.buffer: list[dict] = []
+        self.flusher: Optional[asyncio.Task] = None
+        self.pending_flush: Optional[asyncio.Task] = None
+        # One batch is written at a time, whether by a full buffer, the interval or shutdown
+        self.lock = asyncio.Lock()
+
+    async def on_chat_model_start(self, serialized: dict[str, Any], messages: list[list[BaseMessage]], *, run_id: UUID, metadata: Optional[dict[str, Any]] = None, **kwargs: Any):
+        metadata = metadata or {}
+        invocation_params = kwargs.get("invocation_params") or {}
+        self.runs[run_id] = {
+            "started": time.perf_counter(),
+            "user_id": metadata.get("user_id"),
+            "session_id": metadata.get("thread_id"),
+            "node": metadata.get("langgraph_node"),
+            "model": invocation_params.get("model_name") or invocation_params.get("model"),
+        }
+
+    async def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        run = self.runs.pop(run_id, None)
+        if run is None:
+            return
+
+        prompt_tokens = completion_tokens = total_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                if usage:
+                    prompt_tokens += usage["input_tokens"]
+                    completion_tokens += usage["output_tokens"]
+                    total_tokens += usage["total_tokens"]
+                if message is not None and not run["model"]:
+                    run["model"] = message.response_metadata.get("model_name")
+
+        self.buffer.append({
+            "user_id": run["user_id"],
+            "session_id": run["session_id"],
+            "node": run["node"],
+            "model": run["model"],
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": total_tokens,
+            "latency_ms": (time.perf_counter() - run["started"]) * 1000,
+            "created_at": datetime.now(),
+        })
+        if len(self.buffer) >= self.batch_size:
+            self.schedule_flush()
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self.runs.pop(run_id, None)
+
+    def schedule_flush(self):
+        """ Writes a full buffer in the background so the graph node does not wait on the database """
+        if self.pending_flush is None or self.pending_flush.done():
+            self.pending_flush = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        async with self.lock:
+            records, self.buffer = self.buffer, []
+            if not records:
+                return
+            try:
+                await save_usage(records)
+            except Exception as e:
+                logger.warning(f"Failed to store {len(records)} LLM usage records: {e}")
+
+    async def start(self):
+        self.flusher = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self):
+        if self.flusher is not None:
+            self.flusher.cancel()
+            await asyncio.gather(self.flusher, return_exceptions=True)
+            self.flusher = None
+        if self.pending_flush is not None:
+            await asyncio.gather(self.pending_flush, return_exceptions=True)
+            self.pending_flush = None
+        await self.flush()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            await self.flush()
+
+async def save_usage(records: list[dict]):
+    await run_in_session(CRUD.LLMUsage.create_many, records)
+
+usage_meter = UsageMeter(
+    batch_size=settings.usage_batch_size,
+    flush_interval_seconds=settings.usage_flush_interval_seconds
+)
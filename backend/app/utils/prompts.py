@@ -33,6 +33,20 @@ When you are satisfied with your understanding, complete the interview with: "Th
 Remember to stay in character throughout your response, reflecting the persona and goals provided to you."""
 
 
+search_instructions = """You will be given a conversation between an analyst and an expert. 
+
+Your goal is to generate a well-structured query for use in retrieval and / or web-search related to the conversation.
+        
+First, analyze the full conversation.
+
+Pay particular attention to the final question posed by the analyst.
+
+Convert this final question into a well-structured web search query"""
+
+query_variants_instructions = """
+
+Return {variants} distinct variants of the query, each phrasing the question differently so together they cover it from several angles."""
+
 answer_instructions = """You are an expert being interviewed by an analyst.
 
 Here is analyst area of focus: {goals}. 
@@ -171,4 +185,33 @@ Here are the sections to reflect on for writing: {formatted_str_sections}"""
 
 session_name_instructions = """Let's give this chat session with our research assistant a helpful and memorable name!
 The name should quickly convey the research area we're exploring and ideally help us find this conversation easily later. 
-Think about what makes this particular session unique."""
\ No newline at end of file
+Think about what makes this particular session unique."""
+
+section_batch_summary_instructions = """You are a technical writer condensing a batch of memos for a report on this overall topic:
+
+{topic}
+
+Merge the memos below into a single memo that:
+
+1. Keeps every distinct insight, specific example and number, dropping repetition between memos.
+2. Preserves the citations from the memos, annotated in brackets, for example [1] or [2].
+3. Ends with a consolidated list of sources under a `### Sources` header, with no duplicates.
+4. Uses markdown formatting, with no pre-amble.
+
+Aim for roughly the length of one of the input memos.
+
+Here are the memos to merge:
+
+{context}"""
+
+report_digest_instructions = """You are a technical writer preparing a compact digest of a report on this overall topic:
+
+{topic}
+
+Summarize the key themes and the most important findings of the memos below in around 200 words.
+
+Do not include citations or sources, the digest is only used to write the report introduction and conclusion.
+
+Here are the memos to digest:
+
+{context}"""
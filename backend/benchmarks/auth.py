@@ -0,0 +1,75 @@
+""" Micro-benchmark of Authorization.get_current_user with and without the token and user caches.
+
+The user lookup is replaced by a fake with a fixed latency standing in for the Postgres round trip.
+
+    cd backend
+    python -m benchmarks.auth --iterations 5000 --db-latency 0.001 --output auth.json
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.common import offline_environment, percentile, write_report
+
+offline_environment()
+
+from app.core import auth
+from app.core.auth import Authorization
+from app.db import models
+
+def install_fake_user_lookup(db_latency: float):
+    user = models.User(id=1, first_name="Bench", last_name="Mark", email="bench@example.com")
+
+    async def load_user(email: str):
+        await asyncio.sleep(db_latency)
+        return user if email == user.email else None
+
+    Authorization.load_user = load_user
+    return user
+
+async def run_scenario(name: str, token: str, iterations: int, cached: bool):
+    durations = []
+    for _ in range(iterations):
+        if not cached:
+            auth.token_cache.clear()
+            auth.user_cache.clear()
+        start = time.perf_counter()
+        await Authorization.get_current_user(token)
+        durations.append(time.perf_counter() - start)
+
+    return {
+        "scenario": name,
+        "iterations": iterations,
+        "ops_per_s": iterations / sum(durations),
+        "latency_p50_us": percentile(durations, 0.5) * 1e6,
+        "latency_p99_us": percentile(durations, 0.99) * 1e6,
+        "latency_mean_us": statistics.fmean(durations) * 1e6,
+    }
+
+async def main(args):
+    user = install_fake_user_lookup(args.db_latency)
+    token, _ = Authorization.generate_creds(data={"sub": user.email})
+
+    results = []
+    for name, cached in (("uncached", False), ("cached", True)):
+        # The first cached call fills the caches
+        await Authorization.get_current_user(token)
+        result = await run_scenario(name, token, args.iterations, cached)
+        results.append(result)
+        print(
+            f"{name:>8}: {result['ops_per_s']:,.0f} ops/s "
+            f"p50={result['latency_p50_us']:.1f}us p99={result['latency_p99_us']:.1f}us"
+        )
+
+    if args.output:
+        write_report(args.output, "auth", {"iterations": args.iterations, "db_latency_s": args.db_latency}, results)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmark of the authenticated user lookup.")
+    parser.add_argument("--iterations", type=int, default=5000, help="Calls per scenario.")
+    parser.add_argument("--db-latency", type=float, default=0.001, help="Seconds per fake user query.")
+    parser.add_argument("--output", help="Write machine-readable results to this JSON file.")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,120 @@
+""" Deterministic local stand-ins for OpenAI, Tavily and Wikipedia used by the benchmarks """
+
+from typing import Any, Optional
+import asyncio
+import re
+
+import xxhash
+from langchain_core.documents import Document
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+WORDS = ("research", "analysis", "model", "evidence", "finding", "system", "policy", "impact", "data", "result")
+
+def filler(words: int, seed: str = ""):
+    offset = xxhash.xxh32_intdigest(seed) if seed else 0
+    return " ".join(WORDS[(offset + i) % len(WORDS)] for i in range(words))
+
+def digest(text: str):
+    return xxhash.xxh64_hexdigest(text)[:12]
+
+class FakeChatModel(BaseChatModel):
+    """ Chat model that answers after a fixed latency with a response of a fixed size """
+
+    model_name: str = "gpt-4o"
+    temperature: float = 0
+    latency: float = 0.05
+    response_words: int = 200
+    query_variants: int = 1
+
+    @property
+    def _llm_type(self):
+        return "fake-research"
+
+    def _message(self, messages: list[BaseMessage]):
+        prompt_tokens = sum(len(str(message.content).split()) for message in messages)
+        content = filler(self.response_words, str(messages[-1].content))
+        return AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": prompt_tokens,
+                "output_tokens": self.response_words,
+                "total_tokens": prompt_tokens + self.response_words,
+            }
+        )
+
+    def _generate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None, run_manager: Any = None, **kwargs: Any):
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages))])
+
+    async def _agenerate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None, run_manager: Any = None, **kwargs: Any):
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages))])
+
+    def with_structured_output(self, schema, **kwargs: Any):
+        async def respond(messages):
+            await asyncio.sleep(self.latency)
+            return self._structured(schema, messages)
+
+        return RunnableLambda(respond)
+
+    def _structured(self, schema, messages):
+        from app.utils import agent
+
+        prompt = "\n".join(str(getattr(message, "content", message)) for message in messages)
+        if schema is agent.Perspectives:
+            match = re.search(r"Pick the top (\d+) themes", prompt)
+            count = int(match.group(1)) if match else 3
+            return agent.Perspectives(analysts=[
+                agent.Analyst(
+                    affiliation=f"Institute {i}",
+                    name=f"Analyst {i}",
+                    role=f"Theme {i} specialist",
+                    description=filler(40, f"analyst-{i}")
+                )
+                for i in range(count)
+            ])
+        if schema is agent.SearchQueries:
+            seed = digest(prompt)
+            return agent.SearchQueries(search_queries=[f"{seed} variant {i}" for i in range(self.query_variants)])
+
+        raise ValueError(f"No fake structured output for {schema.__name__}.")
+
+class FakeTavilySearch:
+    """ Web search returning max_results documents per query after a fixed latency """
+
+    def __init__(self, latency: float, document_words: int, max_results: int = 3):
+        self.latency = latency
+        self.document_words = document_words
+        self.max_results = max_results
+
+    async def ainvoke(self, query: str):
+        await asyncio.sleep(self.latency)
+        seed = digest(query)
+        return [
+            {"url": f"https://example.com/{seed}/{i}", "content": filler(self.document_words, f"{seed}-{i}")}
+            for i in range(self.max_results)
+        ]
+
+def fake_wikipedia_loader(latency: float, document_words: int):
+    """ Builds a WikipediaLoader replacement with the given latency and page size """
+
+    class FakeWikipediaLoader:
+
+        def __init__(self, query: str, load_max_docs: int = 2):
+            self.query = query
+            self.load_max_docs = load_max_docs
+
+        async def aload(self):
+            await asyncio.sleep(latency)
+            seed = digest(self.query)
+            return [
+                Document(
+                    page_content=filler(document_words, f"wiki-{seed}-{i}"),
+                    metadata={"source": f"https://en.wikipedia.org/wiki/{seed}_{i}", "title": f"{seed} {i}"}
+                )
+                for i in range(self.load_max_docs)
+            ]
+
+    return FakeWikipediaLoader
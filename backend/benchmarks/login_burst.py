@@ -0,0 +1,152 @@
+""" Load test of password hashing under a login burst.
+
+"hashing" measures bcrypt verifications per second on the password process pool for a range of pool
+sizes, without a server. "server" drives a running backend: it records the latency of a probe endpoint,
+fires a burst of logins while probing again, and reports login throughput per core next to the probe
+latency before and during the burst.
+
+    cd backend
+    python -m benchmarks.login_burst hashing --workers 1,2,4 --rounds 12
+    python -m benchmarks.login_burst server --url http://localhost:8000 --logins 200 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+
+import httpx
+
+from benchmarks.common import percentile, write_report
+
+from app.core.passwords import PasswordHasher, build_context
+
+def parse_counts(value: str):
+    return [int(count) for count in value.split(",") if count.strip()]
+
+def latency_summary(durations: list):
+    return {
+        "requests": len(durations),
+        "latency_p50_ms": percentile(durations, 0.5) * 1000,
+        "latency_p99_ms": percentile(durations, 0.99) * 1000,
+        "latency_mean_ms": statistics.fmean(durations) * 1000,
+    }
+
+async def run_hashing(args):
+    hashed_password = build_context(args.rounds).hash("benchmark-password")
+    results = []
+    for workers in args.workers:
+        hasher = PasswordHasher(workers=workers, rounds=args.rounds)
+        try:
+            # Spawn the workers before timing
+            await asyncio.gather(*[hasher.verify("benchmark-password", hashed_password) for _ in range(workers)])
+
+            start = time.perf_counter()
+            await asyncio.gather(*[hasher.verify("benchmark-password", hashed_password) for _ in range(args.verifications)])
+            wall_time = time.perf_counter() - start
+        finally:
+            hasher.stop()
+
+        result = {
+            "workers": workers,
+            "rounds": args.rounds,
+            "verifications": args.verifications,
+            "verifications_per_s": args.verifications / wall_time,
+            "verifications_per_s_per_core": args.verifications / wall_time / workers,
+        }
+        results.append(result)
+        print(f"workers={workers} rounds={args.rounds} {result['verifications_per_s']:.1f}/s ({result['verifications_per_s_per_core']:.1f}/s per core)")
+
+    if args.output:
+        write_report(args.output, "login_burst_hashing", {"rounds": args.rounds, "verifications": args.verifications}, results)
+
+async def probe(client: httpx.AsyncClient, path: str, stop: asyncio.Event, interval: float):
+    durations = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get(path)
+        response.raise_for_status()
+        durations.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+    return durations
+
+async def probe_for(client: httpx.AsyncClient, path: str, seconds: float, interval: float):
+    stop = asyncio.Event()
+    task = asyncio.create_task(probe(client, path, stop, interval))
+    await asyncio.sleep(seconds)
+    stop.set()
+    return await task
+
+async def run_server(args):
+    email = f"loadtest-{uuid.uuid4().hex[:8]}@example.com"
+    password = "benchmark-password"
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=120) as client:
+        response = await client.post("/users/signin", json={"first_name": "Load", "last_name": "Test", "email": email, "password": password})
+        response.raise_for_status()
+
+        baseline = await probe_for(client, args.probe_path, args.probe_seconds, args.probe_interval)
+
+        slots = asyncio.Semaphore(args.concurrency)
+        login_durations = []
+
+        async def login():
+            async with slots:
+                start = time.perf_counter()
+                response = await client.post("/users/signup", json={"email": email, "password": password})
+                response.raise_for_status()
+                login_durations.append(time.perf_counter() - start)
+
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(client, args.probe_path, stop, args.probe_interval))
+        start = time.perf_counter()
+        await asyncio.gather(*[login() for _ in range(args.logins)])
+        wall_time = time.perf_counter() - start
+        stop.set()
+        during_burst = await probe_task
+
+    result = {
+        "logins": args.logins,
+        "concurrency": args.concurrency,
+        "server_cores": args.server_cores,
+        "logins_per_s": args.logins / wall_time,
+        "logins_per_s_per_core": args.logins / wall_time / args.server_cores,
+        "login": latency_summary(login_durations),
+        "probe_baseline": latency_summary(baseline),
+        "probe_during_burst": latency_summary(during_burst),
+    }
+    print(
+        f"logins: {result['logins_per_s']:.1f}/s ({result['logins_per_s_per_core']:.1f}/s per core), "
+        f"p99={result['login']['latency_p99_ms']:.0f}ms\n"
+        f"{args.probe_path}: p50 {result['probe_baseline']['latency_p50_ms']:.1f}ms -> {result['probe_during_burst']['latency_p50_ms']:.1f}ms, "
+        f"p99 {result['probe_baseline']['latency_p99_ms']:.1f}ms -> {result['probe_during_burst']['latency_p99_ms']:.1f}ms during the burst"
+    )
+
+    if args.output:
+        parameters = {"url": args.url, "probe_path": args.probe_path, "probe_interval_s": args.probe_interval}
+        write_report(args.output, "login_burst_server", parameters, [result])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Login burst load test.")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--output", help="Write machine-readable results to this JSON file.")
+    scenarios = parser.add_subparsers(dest="scenario", required=True)
+
+    hashing = scenarios.add_parser("hashing", parents=[common], help="bcrypt throughput of the password process pool.")
+    hashing.add_argument("--workers", type=parse_counts, default=[1, 2, 4], help="Comma-separated pool sizes.")
+    hashing.add_argument("--rounds", type=int, default=12, help="bcrypt cost.")
+    hashing.add_argument("--verifications", type=int, default=64, help="Verifications per pool size.")
+
+    server = scenarios.add_parser("server", parents=[common], help="Login burst against a running backend.")
+    server.add_argument("--url", default="http://localhost:8000", help="Backend base URL.")
+    server.add_argument("--logins", type=int, default=200, help="Logins in the burst.")
+    server.add_argument("--concurrency", type=int, default=50, help="Logins in flight at the same time.")
+    server.add_argument("--server-cores", type=int, default=os.cpu_count(), help="Cores available to the backend.")
+    server.add_argument("--probe-path", default="/", help="Endpoint whose latency is watched during the burst.")
+    server.add_argument("--probe-interval", type=float, default=0.05, help="Seconds between probe requests.")
+    server.add_argument("--probe-seconds", type=float, default=5, help="Length of the baseline probe.")
+
+    args = parser.parse_args()
+    asyncio.run(run_hashing(args) if args.scenario == "hashing" else run_server(args))
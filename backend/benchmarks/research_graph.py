@@ -0,0 +1,144 @@
+""" Offline benchmark of the research graph orchestration.
+
+Runs generate_analyst followed by analyst_human_feedback("approve") against fake LLM and search
+backends, so the numbers measure graph, checkpoint and pipeline overhead without any API spend.
+Checkpoint bytes only grow with the interview turns when checkpoint_during is on (the default), with
+--no-checkpoint-during only the final and interrupt checkpoints are stored.
+
+    cd backend
+    python -m benchmarks.research_graph --analysts 1,3,5,10 --turns 1,2,3 --output bench.json
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+import uuid
+
+from benchmarks.common import offline_environment, percentile, write_report
+
+offline_environment()
+
+from app.core.config import settings
+from app.db.checkpointer import get_checkpointer
+from app.utils import agent, llm_cache, metering
+
+from benchmarks.fakes import FakeChatModel, FakeTavilySearch, fake_wikipedia_loader
+
+async def discard_usage(records):
+    """ Usage records are dropped instead of going to the llm_usage table """
+
+def install_fakes(args):
+    fake_llm = FakeChatModel(latency=args.llm_latency, response_words=args.response_words, query_variants=settings.search_query_variants)
+    agent.llm = fake_llm
+    llm_cache.llm = fake_llm
+    agent.tavily_search = FakeTavilySearch(args.search_latency, args.document_words)
+    agent.WikipediaLoader = fake_wikipedia_loader(args.search_latency, args.document_words)
+    metering.save_usage = discard_usage
+
+def stored_bytes(value):
+    """ Bytes held by the in-memory checkpointer, walking its nested storage """
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(stored_bytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(stored_bytes(item) for item in value)
+    return 0
+
+def checkpoint_bytes():
+    checkpointer = get_checkpointer()
+    return sum(stored_bytes(getattr(checkpointer, name, {})) for name in ("storage", "writes", "blobs"))
+
+async def run_session(analysts: int):
+    session_id = str(uuid.uuid4())
+    start = time.perf_counter()
+    await agent.generate_analyst(analysts, "The economics of small modular nuclear reactors", session_id)
+    await agent.analyst_human_feedback("approve", session_id)
+    return time.perf_counter() - start
+
+async def run_scenario(analysts: int, turns: int, sessions: int, concurrency: int):
+    settings.max_num_turns = turns
+    slots = asyncio.Semaphore(concurrency)
+
+    async def bounded():
+        async with slots:
+            return await run_session(analysts)
+
+    bytes_before = checkpoint_bytes()
+    tracemalloc.reset_peak()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+
+    latencies = await asyncio.gather(*[bounded() for _ in range(sessions)])
+
+    wall_time = time.perf_counter() - start
+    peak_memory = tracemalloc.get_traced_memory()[1] - memory_before
+
+    return {
+        "analysts": analysts,
+        "turns": turns,
+        "sessions": sessions,
+        "concurrency": concurrency,
+        "wall_time_s": wall_time,
+        "throughput_sessions_per_s": sessions / wall_time,
+        "latency_p50_s": statistics.median(latencies),
+        "latency_p99_s": percentile(latencies, 0.99),
+        "latency_mean_s": statistics.fmean(latencies),
+        "checkpoint_bytes_per_session": (checkpoint_bytes() - bytes_before) / sessions,
+        "peak_memory_bytes": peak_memory,
+    }
+
+def parse_counts(value: str):
+    return [int(count) for count in value.split(",") if count.strip()]
+
+async def main(args):
+    install_fakes(args)
+    settings.search_cache_enabled = args.search_cache
+    settings.checkpoint_during = args.checkpoint_during
+    settings.max_analysts = max(max(args.analysts), settings.max_analysts)
+
+    compile_times = agent.graphs.warm()
+
+    tracemalloc.start()
+    results = []
+    for analysts in args.analysts:
+        for turns in args.turns:
+            result = await run_scenario(analysts, turns, args.sessions, args.concurrency)
+            results.append(result)
+            print(
+                f"analysts={analysts:>2} turns={turns} checkpoint_during={args.checkpoint_during} "
+                f"throughput={result['throughput_sessions_per_s']:.2f}/s "
+                f"p50={result['latency_p50_s'] * 1000:.0f}ms p99={result['latency_p99_s'] * 1000:.0f}ms "
+                f"checkpoint={result['checkpoint_bytes_per_session'] / 1024:.1f}KiB "
+                f"peak_mem={result['peak_memory_bytes'] / 1024 / 1024:.1f}MiB"
+            )
+    tracemalloc.stop()
+
+    if args.output:
+        parameters = {
+            "llm_latency_s": args.llm_latency,
+            "search_latency_s": args.search_latency,
+            "response_words": args.response_words,
+            "document_words": args.document_words,
+            "search_cache": args.search_cache,
+            "checkpoint_during": args.checkpoint_during,
+        }
+        write_report(args.output, "research_graph", parameters, results, graph_compile_times_s=compile_times)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark of the research graph with fake LLM and search backends.")
+    parser.add_argument("--analysts", type=parse_counts, default=[1, 3, 5, 10], help="Comma-separated analyst counts.")
+    parser.add_argument("--turns", type=parse_counts, default=[1, 2, 3], help="Comma-separated interview turn counts.")
+    parser.add_argument("--sessions", type=int, default=5, help="Research sessions per scenario.")
+    parser.add_argument("--concurrency", type=int, default=1, help="Sessions running at the same time.")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds per fake LLM call.")
+    parser.add_argument("--search-latency", type=float, default=0.05, help="Seconds per fake Tavily or Wikipedia call.")
+    parser.add_argument("--response-words", type=int, default=200, help="Words in each fake LLM response.")
+    parser.add_argument("--document-words", type=int, default=300, help="Words in each fake search document.")
+    parser.add_argument("--search-cache", action="store_true", help="Keep the search cache enabled.")
+    parser.add_argument("--checkpoint-during", action=argparse.BooleanOptionalAction, default=True, help="Checkpoint after every step, needed for checkpoint bytes to track the turns.")
+    parser.add_argument("--output", help="Write machine-readable results to this JSON file.")
+
+    asyncio.run(main(parser.parse_args()))
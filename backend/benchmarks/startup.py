@@ -0,0 +1,108 @@
+""" Startup profile of the backend.
+
+Reports the import time of each module pulled in by "import app.main" (python -X importtime), then
+starts uvicorn and measures the time until "/" answers. The database bootstrap is skipped and the
+memory checkpointer used, so no Postgres is needed.
+
+    cd backend
+    python -m benchmarks.startup --top 25 --output startup.json
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import offline_environment, write_report
+
+def startup_environment(warm_up: str):
+    offline_environment()
+    os.environ["DB_CREATE_ON_STARTUP"] = "false"
+    os.environ["DB_MIGRATE_ON_STARTUP"] = "false"
+    os.environ["REPORT_COMPRESSION_BACKFILL"] = "false"
+    os.environ["SEARCH_INDEX_BACKFILL"] = "false"
+    os.environ["STARTUP_WARM_UP"] = warm_up
+    return os.environ.copy()
+
+def import_times(environment: dict):
+    """ Self and cumulative import time in seconds per module, from the -X importtime report """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=environment, capture_output=True, text=True, check=True
+    )
+    modules = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = {"self_s": int(self_us) / 1e6, "cumulative_s": int(cumulative_us) / 1e6}
+    return modules
+
+def by_package(modules: dict):
+    """ Self time summed per top-level package """
+    packages = {}
+    for name, times in modules.items():
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + times["self_s"]
+    return dict(sorted(packages.items(), key=lambda item: item[1], reverse=True))
+
+def time_to_healthy(environment: dict, port: int, timeout: float):
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)],
+        env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.TransportError:
+                pass
+            time.sleep(0.02)
+        raise TimeoutError(f"The backend did not answer on port {port} within {timeout} s.")
+    finally:
+        server.terminate()
+        server.wait()
+
+def main(args):
+    environment = startup_environment(args.warm_up)
+
+    modules = import_times(environment)
+    total = sum(times["self_s"] for times in modules.values())
+    packages = by_package(modules)
+
+    print(f"import app.main: {total * 1000:.0f} ms over {len(modules)} modules")
+    for package, seconds in list(packages.items())[:args.top]:
+        print(f"  {package:<32} {seconds * 1000:8.1f} ms")
+
+    slowest = sorted(modules.items(), key=lambda item: item[1]["cumulative_s"], reverse=True)[:args.top]
+    print("Slowest modules (cumulative):")
+    for name, times in slowest:
+        print(f"  {name:<48} {times['cumulative_s'] * 1000:8.1f} ms")
+
+    healthy = [time_to_healthy(environment, args.port, args.timeout) for _ in range(args.runs)]
+    print(f"Cold start to first healthy response: {min(healthy) * 1000:.0f} ms (best of {args.runs})")
+
+    if args.output:
+        results = [{
+            "import_total_s": total,
+            "import_by_package_s": packages,
+            "slowest_modules": dict(slowest),
+            "time_to_healthy_s": healthy,
+        }]
+        write_report(args.output, "startup", {"warm_up": args.warm_up, "runs": args.runs}, results)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import time per module and cold start time of the backend.")
+    parser.add_argument("--top", type=int, default=20, help="Packages and modules to list.")
+    parser.add_argument("--runs", type=int, default=3, help="Cold starts to time.")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the temporary backend.")
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds to wait for the backend.")
+    parser.add_argument("--warm-up", default="background", choices=["blocking", "background", "off"], help="STARTUP_WARM_UP for the backend.")
+    parser.add_argument("--output", help="Write machine-readable results to this JSON file.")
+
+    main(parser.parse_args())
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+@pytest.fixture
+def user_lookup(monkeypatch):
+    """ A counting user lookup in place of the database query """
+    from app.core import auth
+    from app.core.auth import Authorization
+    from app.db import models
+
+    user = models.User(id=1, first_name="Auth", last_name="Test", email="auth@example.com")
+    calls = []
+
+    async def load_user(email: str):
+        calls.append(email)
+        await asyncio.sleep(0.01)
+        return user if email == user.email else None
+
+    monkeypatch.setattr(Authorization, "load_user", load_user)
+    auth.token_cache.clear()
+    auth.user_cache.clear()
+    token, _ = Authorization.generate_creds(data={"sub": user.email})
+    return token, calls
+
+def test_concurrent_misses_share_one_lookup_and_hits_skip_it(user_lookup):
+    from app.core.auth import Authorization
+
+    token, calls = user_lookup
+
+    async def resolve():
+        users = await asyncio.gather(*(Authorization.get_current_user(token) for _ in range(10)))
+        users.append(await Authorization.get_current_user(token))
+        return users
+
+    users = asyncio.run(resolve())
+
+    assert {user.id for user in users} == {1}
+    assert calls == ["auth@example.com"]
+
+def test_unknown_user_is_rejected(user_lookup):
+    from fastapi import HTTPException
+
+    from app.core.auth import Authorization
+
+    token, _ = Authorization.generate_creds(data={"sub": "missing@example.com"})
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(Authorization.get_current_user(token))
+    assert error.value.status_code == 401
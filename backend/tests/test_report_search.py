@@ -0,0 +1,77 @@
+import asyncio
+import uuid
+
+import pytest
+
+@pytest.fixture
+def user_id(database):
+    """ A user with reports of different and tied ranks for "reactor" """
+    from app.db import models, schemas
+    from app.db.database import SessionLocal
+    from app.utils import CRUD
+
+    db = SessionLocal()
+    user = models.User(first_name="Search", last_name="Test", email=f"search-{uuid.uuid4().hex[:8]}@example.com", password="")
+    db.add(user)
+    db.commit()
+
+    for index in range(5):
+        session_id = str(uuid.uuid4())
+        db.add(models.ResearchSession(id=session_id, user_id=user.id))
+        db.commit()
+        CRUD.ChatHistory.create(db, schemas.ChatHistoryCreate(
+            session_id=session_id,
+            session_name=f"Session {index}",
+            message="Small modular reactors",
+            response="The reactor " * (index % 3 + 1) + "economics of nuclear power."
+        ), user.id)
+
+    yield user.id
+
+    db.query(models.ChatHistory).filter(models.ChatHistory.user_id == user.id).delete()
+    db.query(models.ResearchSession).filter(models.ResearchSession.user_id == user.id).delete()
+    db.query(models.User).filter(models.User.id == user.id).delete()
+    db.commit()
+    db.close()
+
+async def search_pages(database_mode: str, user_id: int, limit: int):
+    from app.db.database import AsyncSessionLocal, SessionLocal, async_engine, run_db
+    from app.utils import CRUD
+
+    async def collect(db):
+        pages, cursor = [], None
+        while True:
+            results, cursor = await run_db(db, CRUD.ChatHistory.search, user_id, "reactor", limit, cursor)
+            pages.append(results)
+            if cursor is None:
+                return pages
+
+    if database_mode == "async":
+        try:
+            async with AsyncSessionLocal() as db:
+                return await collect(db)
+        finally:
+            # The pool is bound to this event loop
+            await async_engine.dispose()
+
+    db = SessionLocal()
+    try:
+        return await collect(db)
+    finally:
+        db.close()
+
+@pytest.mark.parametrize("database_mode", ["sync", "async"])
+def test_search_pages_through_every_result(database_mode, user_id):
+    pages = asyncio.run(search_pages(database_mode, user_id, limit=2))
+    everything, = asyncio.run(search_pages(database_mode, user_id, limit=50))
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    paged = [result for page in pages for result in page]
+    assert [result["id"] for result in paged] == [result["id"] for result in everything]
+    assert [result["rank"] for result in paged] == sorted((result["rank"] for result in paged), reverse=True)
+
+def test_snippets_escape_report_html():
+    from app.db.search_index import HIGHLIGHT_START, HIGHLIGHT_STOP, highlighted_html
+
+    headline = f"<script>alert(1)</script> the {HIGHLIGHT_START}reactor{HIGHLIGHT_STOP} & <mark>"
+    assert highlighted_html(headline) == "&lt;script&gt;alert(1)&lt;/script&gt; the <mark>reactor</mark> &amp; &lt;mark&gt;"
@@ -0,0 +1,52 @@
+import asyncio
+import sys
+import uuid
+
+import pytest
+
+@pytest.fixture
+def fake_backends(monkeypatch):
+    """ The research graph on the benchmark fakes, with usage records collected instead of stored """
+    from app.utils import agent, llm_cache, metering
+    from benchmarks.fakes import FakeChatModel, FakeTavilySearch, fake_wikipedia_loader
+
+    fake_llm = FakeChatModel(latency=0, response_words=20)
+    monkeypatch.setattr(agent, "llm", fake_llm)
+    monkeypatch.setattr(llm_cache, "llm", fake_llm)
+    monkeypatch.setattr(agent, "tavily_search", FakeTavilySearch(0, 50))
+    monkeypatch.setattr(agent, "WikipediaLoader", fake_wikipedia_loader(0, 50))
+
+    records = []
+
+    async def collect_usage(batch):
+        records.extend(batch)
+
+    monkeypatch.setattr(metering, "save_usage", collect_usage)
+    return records
+
+@pytest.fixture
+def without_context_propagation(monkeypatch):
+    """ LangGraph as on Python 3.10, where asyncio tasks do not carry the run config in a contextvar """
+    for name, module in list(sys.modules.items()):
+        if name.startswith("langgraph") and hasattr(module, "ASYNCIO_ACCEPTS_CONTEXT"):
+            monkeypatch.setattr(module, "ASYNCIO_ACCEPTS_CONTEXT", False)
+
+async def run_report(session_id: str, user_id: int):
+    from app.utils import agent
+    from app.utils.metering import usage_meter
+
+    await agent.generate_analyst(2, "The economics of small modular nuclear reactors", session_id, user_id)
+    await agent.approve_analysts(session_id)
+    events = [event async for event in agent.stream_report(session_id, user_id)]
+    await usage_meter.flush()
+    return events
+
+def test_run_config_reaches_llm_calls_without_context_propagation(fake_backends, without_context_propagation):
+    session_id = str(uuid.uuid4())
+
+    events = asyncio.run(run_report(session_id, user_id=7))
+
+    assert any(event["event"] == "token" for event in events)
+    assert fake_backends
+    assert all(record["session_id"] == session_id and record["user_id"] == 7 for record in fake_backends)
+    assert {"create_analysts", "ask_question", "write_section", "write_report"} <= {record["node"] for record in fake_backends}
@@ -20,6 +20,8 @@ export interface ChatMessage {
 
 export interface ChatState {
 	sessions: ChatSession[];
+	sessionsCursor: string | null;
+	isLoadingMoreSessions: boolean;
 	currentSessionId: string | null;
 	currentMessages: ChatMessage[];
 	isLoading: boolean;
@@ -29,6 +31,8 @@ export interface ChatState {
 
 const initialState: ChatState = {
 	sessions: [],
+	sessionsCursor: null,
+	isLoadingMoreSessions: false,
 	currentSessionId: null,
 	currentMessages: [],
 	isLoading: false,
@@ -36,6 +40,55 @@ const initialState: ChatState = {
 	error: null
 };
 
+const JOB_POLL_INTERVAL_MS = 3000;
+
+async function fetchSessions(token: string, cursor: string | null) {
+	const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+	const response = await fetch(`/api/users/get-sessions${query}`, {
+		headers: {
+			'Authorization': `Bearer ${token}`
+		}
+	});
+
+	if (!response.ok) {
+		throw new Error('Failed to load sessions');
+	}
+
+	return response.json();
+}
+
+async function pollJob(jobId: string, sessionId: string, token: string) {
+	const sessionJobUrl = `/api/ai/sessions/${sessionId}/job`;
+	let url = `/api/ai/jobs/${jobId}`;
+	while (true) {
+		const response = await fetch(url, {
+			headers: {
+				'Authorization': `Bearer ${token}`
+			}
+		});
+
+		// A backend worker that does not know the job yet, follow the session's latest job instead
+		if (response.status === 404 && url !== sessionJobUrl) {
+			url = sessionJobUrl;
+			continue;
+		}
+
+		if (!response.ok) {
+			throw new Error('Failed to load report status');
+		}
+
+		const job = await response.json();
+		if (job.status === 'completed') {
+			return [job.report, job.token_usage];
+		}
+		if (job.status === 'failed') {
+			throw new Error(job.error || 'Report generation failed');
+		}
+
+		await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+	}
+}
+
 function createChatStore() {
 	const { subscribe, set, update } = writable<ChatState>(initialState);
 
@@ -48,20 +101,11 @@ function createChatStore() {
 			update(state => ({ ...state, isLoading: true, error: null }));
 
 			try {
-				const response = await fetch('/api/users/get-sessions', {
-					headers: {
-						'Authorization': `Bearer ${auth.token}`
-					}
-				});
-
-				if (!response.ok) {
-					throw new Error('Failed to load sessions');
-				}
-
-				const data = await response.json();
+				const data = await fetchSessions(auth.token, null);
 				update(state => ({
 					...state,
 					sessions: data.sessions || [],
+					sessionsCursor: data.next_cursor || null,
 					isLoading: false
 				}));
 			} catch (error) {
@@ -72,6 +116,29 @@ function createChatStore() {
 				}));
 			}
 		},
+		loadMoreSessions: async () => {
+			const auth = get(authStore);
+			const state = get({ subscribe });
+			if (!auth.token || !state.sessionsCursor || state.isLoadingMoreSessions) return;
+
+			update(state => ({ ...state, isLoadingMoreSessions: true, error: null }));
+
+			try {
+				const data = await fetchSessions(auth.token, state.sessionsCursor);
+				update(state => ({
+					...state,
+					sessions: [...state.sessions, ...(data.sessions || [])],
+					sessionsCursor: data.next_cursor || null,
+					isLoadingMoreSessions: false
+				}));
+			} catch (error) {
+				update(state => ({
+					...state,
+					isLoadingMoreSessions: false,
+					error: error instanceof Error ? error.message : 'Failed to load sessions'
+				}));
+			}
+		},
 		loadSessionHistory: async (sessionId: string) => {
 			const auth = get(authStore);
 			if (!auth.token) return;
@@ -79,17 +146,25 @@ function createChatStore() {
 			update(state => ({ ...state, isLoading: true, error: null }));
 
 			try {
-				const response = await fetch(`/api/users/get-session-history/${sessionId}`, {
-					headers: {
-						'Authorization': `Bearer ${auth.token}`
+				// History is paginated oldest first, follow X-Next-Cursor so the newest reports are not cut off
+				const messages: ChatMessage[] = [];
+				let cursor: string | null = null;
+				do {
+					const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+					const response = await fetch(`/api/users/get-session-history/${sessionId}${query}`, {
+						headers: {
+							'Authorization': `Bearer ${auth.token}`
+						}
+					});
+
+					if (!response.ok) {
+						throw new Error('Failed to load session history');
 					}
-				});
 
-				if (!response.ok) {
-					throw new Error('Failed to load session history');
-				}
+					messages.push(...await response.json());
+					cursor = response.headers.get('X-Next-Cursor');
+				} while (cursor);
 
-				const messages = await response.json();
 				update(state => ({
 					...state,
 					currentSessionId: sessionId,
@@ -173,7 +248,13 @@ function createChatStore() {
 					throw new Error(error.detail || 'Failed to submit feedback');
 				}
 
-				const data = await response.json();
+				let data = await response.json();
+
+				// Approving the analysts starts a background report job, poll it until it finishes
+				if (data.job_id) {
+					data = await pollJob(data.job_id, sessionId, auth.token);
+				}
+
 				update(state => ({ ...state, isGenerating: false }));
 				
 				// Reload sessions to get the updated list